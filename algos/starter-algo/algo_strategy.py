@@ -18,7 +18,8 @@ You can analyze action frames by modifying algocore.py.
 
 The GameState.map object can be manually manipulated to create hypothetical 
 board states. Though, we recommended making a copy of the map to preserve 
-the actual current map state.
+the actual current map state. GameState.fork() and GameMap.fork() create 
+cheap copies that only copy the tiles you change.
 """
 
 class AlgoStrategy(gamelib.AlgoCore):
@@ -49,7 +50,8 @@ class AlgoStrategy(gamelib.AlgoCore):
         unit deployments, and transmitting your intended deployments to the
         game engine.
         """
-        game_state = gamelib.GameState(self.config, turn_state)
+        game_state = gamelib.GameState(self.config, turn_state, state=self.turn_state)
+        #game_state = self.persistent_game_state(turn_state)  #Use this line instead to reuse the previous turn's game state.
         gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
         #game_state.suppress_warnings(True)  #Uncomment this line to suppress warnings.
 
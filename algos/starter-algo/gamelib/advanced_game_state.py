@@ -1,5 +1,7 @@
-from .game_state import GameState, GameUnit
-import sys
+from .game_state import GameState
+from .unit import GameUnit
+from . import geometry
+from .targeting import resolve_targets
 import warnings
 
 class AdvancedGameState(GameState):
@@ -20,68 +22,40 @@ class AdvancedGameState(GameState):
             The GameUnit this unit would choose to attack.
 
         """
-        
-        from .game_state import SCRAMBLER, is_stationary
-
         if not isinstance(attacking_unit, GameUnit):
             warnings.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
             return
 
         attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.range)
-        target = None
-        target_stationary = True
-        target_distance = sys.maxsize
-        target_stability = sys.maxsize
-        target_y = self.ARENA_SIZE
-        target_x_distance = 0
-
-        for location in possible_locations:
-            for unit in self.game_map[location]:
-                """
-                NOTE: scrambler units cannot attack firewalls so skip them if unit is firewall
-                """
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.unit_type == SCRAMBLER and is_stationary(unit)):
-                    continue
-
-                new_target = False
-                unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
-                unit_stability = unit.stability
-                unit_y = unit.y
-                unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
-
-                if target_stationary and not unit_stationary:
-                    new_target = True
-                elif not target_stationary and unit_stationary:
-                    continue
-                
-                if target_distance > unit_distance:
-                    new_target = True
-                elif target_distance < unit_distance and not new_target:
-                    continue
-
-                if target_stability > unit_stability:
-                    new_target = True
-                elif target_stability < unit_stability and not new_target:
-                    continue
-
-                if target_y > unit_y:
-                    new_target = True
-                elif target_y < unit_y and not new_target:
-                    continue       
-
-                if target_x_distance < unit_x_distance:
-                    new_target = True
-                
-                if new_target:
-                    target = unit
-                    target_stationary = unit_stationary
-                    target_distance = unit_distance
-                    target_stability = unit_stability
-                    target_y = unit_y
-                    target_x_distance = unit_x_distance
-        return target
+        candidates = [unit for location in self.__locations_in_range(attacker_location, attacking_unit.range)
+                      for unit in self.game_map[location]]
+        index = resolve_targets([self.__attacker(attacking_unit, None)], [self.__target(unit) for unit in candidates])[0]
+        return candidates[index] if index != -1 else None
+
+    def get_targets(self, attacking_units):
+        """Returns the target of each of several units, resolving them all at once. See get_target for the targeting priority.
+
+        Much faster than calling get_target for every unit when there are many attackers, such as every unit in a busy frame.
+
+        Args:
+            * attacking_units: A list of GameUnits
+
+        Returns:
+            A list with the GameUnit each unit would choose to attack, None for units without a target.
+
+        """
+        candidates = [unit for location in self.game_map.iter_occupied() for unit in self.game_map[location]]
+        attackers = [self.__attacker(unit, unit.range) for unit in attacking_units]
+        indices = resolve_targets(attackers, [self.__target(unit) for unit in candidates])
+        return [candidates[index] if index != -1 else None for index in indices]
+
+    def __attacker(self, unit, attack_range):
+        """The attacker tuple resolve_targets expects. Scrambler units cannot attack firewalls, so they ignore them
+        """
+        return (unit.x, unit.y, unit.player_index, attack_range, unit.unit_type == self.SCRAMBLER)
+
+    def __target(self, unit):
+        return (unit.x, unit.y, unit.player_index, unit.stationary, unit.stability)
 
     def get_attackers(self, location, player_index):
         """Gets the destructors threatening a given location
@@ -94,9 +68,6 @@ class AdvancedGameState(GameState):
             A list of destructors that would attack a unit controlled by the given player at the given location
 
         """
-        
-        from .game_state import DESTRUCTOR, UNIT_TYPE_TO_INDEX
-
         if not player_index == 0 and not player_index == 1:
             self._invalid_player_index(player_index)
         if not self.game_map.in_arena_bounds(location):
@@ -104,11 +75,24 @@ class AdvancedGameState(GameState):
 
         attackers = []
         """
-        Get locations in the range of DESTRUCTOR units
+        Get locations in the range of DESTRUCTOR units, then check the indexed enemy destructors against them
+        instead of scanning every tile in range
         """
-        possible_locations= self.game_map.get_locations_in_range(location, self.config["unitInformation"][UNIT_TYPE_TO_INDEX[DESTRUCTOR]]["range"])
-        for location in possible_locations:
-            for unit in self.game_map[location]:
-                if unit.unit_type == DESTRUCTOR and unit.player_index != player_index:
+        possible_locations = self.__locations_in_range(location, self.game_config.unit_stats[self.DESTRUCTOR].range)
+        in_range = set(tuple(possible_location) for possible_location in possible_locations)
+        for owner in (0, 1):
+            if owner == player_index:
+                continue
+            for unit in self.game_map.units_of(owner, self.DESTRUCTOR):
+                if (unit.x, unit.y) in in_range:
                     attackers.append(unit)
+        attackers.sort(key=lambda unit: (unit.x, unit.y))
         return attackers
+
+    def __locations_in_range(self, location, radius):
+        """Same as GameMap.get_locations_in_range, but returns the cached tuple of locations when possible
+        """
+        x, y = location
+        if type(x) == int and type(y) == int and self.game_map.in_arena_bounds(location):
+            return geometry.locations_in_range(x, y, radius)
+        return self.game_map.get_locations_in_range(location, radius)
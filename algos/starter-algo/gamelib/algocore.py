@@ -1,17 +1,35 @@
-import json
+import time
 
 from .game_state import GameState
-from .util import get_command, debug_write, BANNER_TEXT, send_command
+from .game_config import compile_config
+from . import frames
+from .util import get_command, debug_write, BANNER_TEXT, send_command, json_loads
 
 class AlgoCore(object):
     """This class handles communication with the game itself. Your strategy should subclass it.
 
     Attributes:
         * config (JSON): json object containing information about the game
+        * game_config (:obj: GameConfig): The config compiled into lookup tables, shared by every GameState built from it
+        * game_state (:obj: GameState): The game state kept across turns by persistent_game_state, None until it is first used
+        * background_planner (:obj: BackgroundPlanner): Set this to plan for the next turn during the action phase, None by default.
+          It is started with turn_state after every on_turn, receives the action frames as they arrive,
+          and is stopped when the next turn comes in
+        * background_result: The best plan the background planner offered before it was stopped, available in on_turn
+        * turn_state (dict): The state of the current turn decoded from json, set before on_turn is called.
+          Pass it to GameState as state, so the string on_turn gets is not decoded a second time
+        * turn_start_time (float): The time.monotonic() time the current turn state arrived, see TurnScheduler.begin_turn
 
     """
     def __init__(self):
         self.config = None
+        self.game_config = None
+        self.game_state = None
+        self.background_planner = None
+        self.background_result = None
+        self.turn_state = None
+        self.turn_start_time = None
+        self.__turn_string = None
 
     def on_game_start(self, config):
         """
@@ -22,11 +40,43 @@ class AlgoCore(object):
 
     def on_turn(self, game_state):
         """
-        This step function is called every turn and is passed a string containing
-        the current game state, which can be used to initialize a new GameMap
+        This step function is called every turn and is passed the current game state,
+        a json string which can be used to initialize a new GameState. The same state,
+        already decoded, is in self.turn_state
         """
         self.submit_default_turn()
 
+    def persistent_game_state(self, turn_state, state_class=GameState):
+        """Gets a game state for this turn that is kept and updated from turn to turn
+
+        Use this in on_turn instead of creating a new GameState to reuse the map, the path finder and
+        the path cache of the previous turn. Only the tiles that changed since the previous turn are
+        replaced, see GameState.update. Changes you made to the game state last turn are discarded.
+
+        Args:
+            * turn_state: The game state passed to on_turn
+            * state_class: The class of the persistent game state, GameState or AdvancedGameState
+
+        Returns:
+            The persistent game state, updated to this turn
+
+        """
+        state = self.turn_state if turn_state is self.__turn_string else None
+        if type(self.game_state) != state_class:
+            self.game_state = state_class(self.config, turn_state, state=state)
+        else:
+            self.game_state.update(turn_state, state)
+        return self.game_state
+
+    def on_action_frame(self, frames):
+        """
+        Override this to look at the action phase. It is called once per action phase with a generator
+        of the action frames, each decoded from json. Frames are only read and decoded as you iterate,
+        and you can stop at any point. Frames you do not read cost almost nothing.
+        A FrameStore can keep the frames you read compactly for later analysis.
+        """
+        pass
+
     def submit_default_turn(self):
         send_command("")
         send_command("")
@@ -40,41 +90,66 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        next_message = None
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
-            game_state_string = get_command()
-            if "replaySave" in game_state_string:
+            game_state_string = next_message if next_message is not None else get_command()
+            next_message = None
+            message_time = time.monotonic()
+            stateType = frames.message_type(game_state_string)
+            if stateType == frames.CONFIG:
                 """
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
-                parsed_config = json.loads(game_state_string)
+                parsed_config = json_loads(game_state_string)
+                self.game_config = compile_config(parsed_config)
                 self.on_game_start(parsed_config)
-            elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
-                if stateType == 0:
-                    """
-                    This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
-                    deploy phase. Printing is handled by the provided functions.
-                    """
-                    self.on_turn(game_state_string)
-                elif stateType == 1:
-                    """
-                    If stateType == 1, this game_state_string string represents the results of an action phase
-                    """
-                    continue
-                elif stateType == 2:
+            elif stateType == frames.TURN:
+                """
+                This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
+                deploy phase. Printing is handled by the provided functions.
+                The decoded state is kept in turn_state so GameState does not have to parse the string again.
+                """
+                self.turn_start_time = message_time
+                self.turn_state = json_loads(game_state_string)
+                self.__turn_string = game_state_string
+                if self.background_planner is not None:
+                    self.background_result = self.background_planner.stop()
+                self.on_turn(game_state_string)
+                if self.background_planner is not None:
+                    self.background_planner.start(self.turn_state)
+            elif stateType == frames.ACTION_FRAME:
+                """
+                If stateType == 1, this game_state_string string represents the results of an action phase.
+                The frames of the phase are offered to on_action_frame, and whatever it does not read is skipped
+                without being decoded. The message after the phase is handled on the next loop.
+                """
+                reader = frames.FrameReader(game_state_string, get_command)
+                if self.background_planner is not None and self.background_planner.running:
                     """
-                    This is the end game message. This means the game is over so break and finish the program.
+                    The background planner gets every frame, including those on_action_frame does not read
                     """
-                    debug_write("Got end state quitting bot.")
-                    break
+                    action_frames = self.background_planner.feed(reader.frames())
+                    self.on_action_frame(action_frames)
+                    for _ in action_frames:
+                        pass
                 else:
-                    """
-                    Something is wrong? Recieved an incorrect or imporperly formatted string.
-                    """
-                    debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
+                    self.on_action_frame(reader.frames())
+                next_message = reader.drain()
+            elif stateType == frames.GAME_OVER:
+                """
+                This is the end game message. This means the game is over so break and finish the program.
+                """
+                debug_write("Got end state quitting bot.")
+                if self.background_planner is not None:
+                    self.background_planner.stop()
+                break
+            elif stateType != frames.UNKNOWN:
+                """
+                Something is wrong? Recieved an incorrect or imporperly formatted string.
+                """
+                debug_write("Got unexpected string with turnInfo: {}".format(game_state_string))
             else:
                 """
                 Something is wrong? Recieved an incorrect or imporperly formatted string.
@@ -0,0 +1,158 @@
+import threading
+import traceback
+from collections import deque
+
+from .util import debug_write
+
+"""
+Planning in the background while the game plays out the action phase. The algo spends the
+action phase waiting for messages on stdin, which releases the interpreter, so a worker
+thread gets that time to search for the next turn.
+"""
+
+
+class BackgroundPlanner:
+    """Runs a planning function in a worker thread between turns
+
+    The planning function is called as plan(planner) in the worker thread. It should read
+    planner.turn_state and planner.new_frames(), publish its best plan so far with planner.offer,
+    and return soon after planner.stopped becomes True. AlgoCore starts the planner after each
+    turn is submitted and stops it when the next turn arrives, see AlgoCore.background_planner.
+
+    Attributes:
+        * turn_state: The game state of the turn that was just submitted, decoded from json
+        * stopped (bool): True once the planner has been asked to stop
+        * result: The best plan offered so far, None if nothing has been offered
+        * error (Exception): The exception raised by the planning function, if any
+
+    """
+    def __init__(self, plan, stop_timeout=0.05):
+        """Creates a planner that is not running yet
+
+        Args:
+            * plan: The planning function, called as plan(planner) in the worker thread
+            * stop_timeout: How long, in seconds, stop waits for the planning function to return
+
+        """
+        self.plan = plan
+        self.stop_timeout = stop_timeout
+        self.turn_state = None
+        self.result = None
+        self.error = None
+        self._stop_event = threading.Event()
+        self._stop_event.set()
+        self._lock = threading.Lock()
+        self._frames = deque()
+        self._thread = None
+        # Each start gets a new generation and a new frame queue, so a worker left over from an
+        # earlier turn stays stopped and can not take frames meant for the current one
+        self._generation = 0
+        self._worker = threading.local()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set() or getattr(self._worker, "generation", self._generation) != self._generation
+
+    @property
+    def running(self):
+        return self._thread is not None and not self.stopped
+
+    def start(self, turn_state):
+        """Starts planning from a turn state in a new worker thread
+
+        Args:
+            * turn_state: The game state of the turn that was just submitted, decoded from json
+
+        """
+        if self.running:
+            self.stop()
+        self.turn_state = turn_state
+        self.result = None
+        self.error = None
+        self._frames = deque()
+        self._generation += 1
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.__run, args=(self._generation, self._frames),
+                                        name="BackgroundPlanner", daemon=True)
+        self._thread.start()
+
+    def __run(self, generation, frames):
+        self._worker.generation = generation
+        self._worker.frames = frames
+        try:
+            self.plan(self)
+        except Exception as error:
+            self.error = error
+            debug_write("Background planning failed: {}".format(traceback.format_exc()))
+
+    def stop(self):
+        """Asks the planning function to stop and waits up to stop_timeout seconds for it
+
+        A planning function that does not stop in time keeps running, but its later offers are ignored.
+
+        Returns:
+            The best plan offered before stopping, None if nothing was offered
+
+        """
+        with self._lock:
+            self._stop_event.set()
+            result = self.result
+        if self._thread is not None:
+            self._thread.join(self.stop_timeout)
+            self._thread = None
+        return result
+
+    def offer(self, result):
+        """Publishes the best plan found so far. Called from the planning function
+
+        Args:
+            * result: The plan, in whatever form on_turn expects
+
+        Returns:
+            False if the planner has been stopped and the plan was ignored, True otherwise
+
+        """
+        with self._lock:
+            if self.stopped:
+                return False
+            self.result = result
+            return True
+
+    def wait(self, seconds):
+        """Sleeps until the planner is stopped or the given time passes. Called from the planning function
+
+        Returns:
+            True if the planner has been stopped
+
+        """
+        self._stop_event.wait(seconds)
+        return self.stopped
+
+    def add_frame(self, frame):
+        """Passes a decoded action frame to the planning function
+        """
+        self._frames.append(frame)
+
+    def feed(self, frames):
+        """Passes frames through to the caller while also handing each one to the planning function
+
+        Args:
+            * frames: A generator of decoded action frames, see FrameReader.frames
+
+        """
+        for frame in frames:
+            self._frames.append(frame)
+            yield frame
+
+    def new_frames(self):
+        """The action frames that arrived since the last call. Called from the planning function
+
+        Returns:
+            A list of decoded action frames, oldest first
+
+        """
+        queue = getattr(self._worker, "frames", self._frames)
+        frames = []
+        while queue:
+            frames.append(queue.popleft())
+        return frames
@@ -0,0 +1,205 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import geometry
+from . import snapshot
+from .game_config import compile_config
+
+"""
+Scoring many candidate boards at once. The firewalls of N boards are stacked into (N, 28, 28)
+arrays straight from their snapshots, and features such as threat, shield coverage and path
+lengths are computed for every board with the same array operations. Requires NumPy.
+"""
+
+_range_matrices = {}
+
+
+def _range_matrix(radius):
+    """A (784, 784) array that is 1 where the tile of the column is within range of the tile of the row, see geometry.locations_in_range
+    """
+    matrix = _range_matrices.get(radius)
+    if matrix is None:
+        size = geometry.ARENA_SIZE
+        matrix = np.zeros((size * size, size * size))
+        for index in geometry.ARENA_TILES:
+            for x, y in geometry.locations_in_range(index // size, index % size, radius):
+                matrix[index, x * size + y] = 1
+        _range_matrices[radius] = matrix
+    return matrix
+
+
+class BoardBatch:
+    """The firewalls of N boards as (N, 28, 28) arrays, indexed [board, x, y]
+
+    Information units are left out, since candidate layouts are about firewalls.
+
+    Attributes:
+        * game_config (:obj: GameConfig): The compiled config of the boards
+        * unit_type (int8 array): The index of the firewall type in config["unitInformation"], -1 for tiles without a firewall
+        * owner (int8 array): The player index of the firewall, -1 for tiles without a firewall
+        * stability (float64 array): The stability of the firewall, 0 for tiles without a firewall
+        * in_bounds (bool array): True for tiles that are part of the arena, shaped (28, 28)
+        * feature_names (list): The name of each column of features()
+
+    """
+    def __init__(self, config, snapshots):
+        """Stacks boards from snapshots, without building a GameState for any of them
+
+        Args:
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+            * snapshots: A list of snapshots, see GameState.to_bytes
+
+        """
+        if np is None:
+            raise ImportError("BoardBatch requires numpy")
+        game_config = compile_config(config)
+        self.game_config = game_config
+        size = geometry.ARENA_SIZE
+        boards = len(snapshots)
+        shape = (boards, size, size)
+        self.unit_type = np.full(shape, -1, dtype=np.int8)
+        self.owner = np.full(shape, -1, dtype=np.int8)
+        self.stability = np.zeros(shape)
+        self.in_bounds = np.frombuffer(bytes(geometry.IN_BOUNDS), dtype=np.uint8).reshape(size, size).astype(bool)
+
+        firewall_codes = sorted(game_config.type_code(unit_type) for unit_type in game_config.FIREWALL_TYPES)
+        is_firewall = np.zeros(len(game_config.unit_types), dtype=bool)
+        is_firewall[firewall_codes] = True
+        self._firewall_codes = firewall_codes
+
+        board_ids = []
+        columns = []
+        stabilities = []
+        for board, data in enumerate(snapshots):
+            header = snapshot.read_header(data)
+            count, columns_offset, stability_offset = header[9], header[11], header[12]
+            board_ids.append(np.full(count, board, dtype=np.intp))
+            columns.append(np.frombuffer(data, dtype=np.uint8, count=5 * count, offset=columns_offset).reshape(5, count))
+            stabilities.append(np.frombuffer(data, dtype="<f8", count=count, offset=stability_offset))
+        if boards:
+            board_ids = np.concatenate(board_ids)
+            codes, owners, xs, ys, _ = np.concatenate(columns, axis=1)
+            stabilities = np.concatenate(stabilities)
+            firewalls = is_firewall[codes]
+            index = (board_ids[firewalls], xs[firewalls], ys[firewalls])
+            self.unit_type[index] = codes[firewalls]
+            self.owner[index] = owners[firewalls]
+            self.stability[index] = stabilities[firewalls]
+
+        self.feature_names = []
+        for player_index in (0, 1):
+            for code in firewall_codes:
+                self.feature_names.append("count_{}_{}".format(game_config.unit_types[code], player_index))
+            self.feature_names += ["stability_{}".format(player_index), "threat_{}".format(player_index),
+                                   "threatened_tiles_{}".format(player_index), "shield_{}".format(player_index)]
+        self.feature_names += ["path_length_{}".format(edge) for edge in range(4)]
+
+    @classmethod
+    def from_game_states(cls, game_states):
+        """Stacks the boards of a list of game states, see GameState.to_bytes
+
+        Args:
+            * game_states: A non-empty list of game states sharing the same config
+
+        """
+        return cls(game_states[0].game_config, [game_state.to_bytes() for game_state in game_states])
+
+    def __len__(self):
+        return self.unit_type.shape[0]
+
+    def __coverage(self, values):
+        """Spreads the value on each tile to every tile within range of it, per unit type
+        """
+        size = geometry.ARENA_SIZE
+        total = np.zeros((len(self), size * size))
+        for code in self._firewall_codes:
+            plane = np.where(self.unit_type == code, values, 0).reshape(len(self), size * size)
+            if plane.any():
+                total += plane @ _range_matrix(self.game_config.unit_stats[self.game_config.unit_types[code]].range)
+        return total.reshape(len(self), size, size)
+
+    def threat(self, player_index):
+        """The damage per frame enemy firewalls deal to a unit of a player on every tile of every board, see GameMap.threat_at
+
+        Returns:
+            A float array shaped (N, 28, 28)
+
+        """
+        attack_damage = np.array(self.game_config.attack_damage, dtype=float)
+        enemy = self.owner == 1 - player_index
+        return self.__coverage(np.where(enemy, attack_damage[self.unit_type], 0))
+
+    def shield(self, player_index):
+        """The total shield friendly firewalls give to a unit of a player on every tile of every board, see GameMap.shield_at
+
+        Returns:
+            A float array shaped (N, 28, 28)
+
+        """
+        shield_amount = np.array(self.game_config.shield_amount, dtype=float)
+        friendly = self.owner == player_index
+        return self.__coverage(np.where(friendly, shield_amount[self.unit_type], 0))
+
+    def distance_to_edge(self, target_edge):
+        """The number of steps from every tile of every board to the nearest reachable tile of an edge
+
+        Returns:
+            A float array shaped (N, 28, 28). Tiles that are blocked or can not reach the edge are inf
+
+        """
+        return self.__distances((target_edge,))[0]
+
+    def __distances(self, target_edges):
+        """Breadth first search out of several edges at once, on every board, one step per iteration
+        """
+        size = geometry.ARENA_SIZE
+        open_tiles = self.in_bounds & (self.unit_type < 0)
+        edges = np.zeros((len(target_edges), 1, size, size), dtype=bool)
+        for number, edge in enumerate(target_edges):
+            edges[number, 0].flat[list(geometry.EDGE_INDICES[edge])] = True
+        reached = edges & open_tiles
+        distance = np.where(reached, 0.0, np.inf)
+        frontier = reached
+        grown = np.empty_like(reached)
+        step = 0
+        while frontier.any():
+            step += 1
+            grown.fill(False)
+            grown[..., 1:, :] |= frontier[..., :-1, :]
+            grown[..., :-1, :] |= frontier[..., 1:, :]
+            grown[..., :, 1:] |= frontier[..., :, :-1]
+            grown[..., :, :-1] |= frontier[..., :, 1:]
+            frontier = grown & open_tiles & ~reached
+            reached |= frontier
+            distance[frontier] = step
+        return distance
+
+    def features(self):
+        """Computes the features of every board
+
+        For each player: the number of firewalls of each type, their total stability, the total threat to
+        the player's units over the arena, the number of tiles under threat, and the total shield coverage.
+        Then, for each start edge, the shortest path from a free tile of the edge to the opposite edge,
+        inf if there is none. See feature_names for the order.
+
+        Returns:
+            A float array shaped (N, F)
+
+        """
+        columns = []
+        for player_index in (0, 1):
+            friendly = self.owner == player_index
+            for code in self._firewall_codes:
+                columns.append((friendly & (self.unit_type == code)).sum(axis=(1, 2)))
+            columns.append(np.where(friendly, self.stability, 0).sum(axis=(1, 2)))
+            threat = self.threat(player_index)
+            columns.append(threat.sum(axis=(1, 2)))
+            columns.append((threat > 0).sum(axis=(1, 2)))
+            columns.append(self.shield(player_index).sum(axis=(1, 2)))
+        distances = self.__distances([(start_edge + 2) % 4 for start_edge in range(4)])
+        for start_edge in range(4):
+            edge_x, edge_y = zip(*(divmod(index, geometry.ARENA_SIZE) for index in geometry.EDGE_INDICES[start_edge]))
+            columns.append(distances[start_edge][:, edge_x, edge_y].min(axis=1))
+        return np.stack(columns, axis=1).astype(float)
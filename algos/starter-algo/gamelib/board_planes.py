@@ -0,0 +1,244 @@
+import copy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .geometry import ARENA_SIZE, HALF_ARENA, IN_BOUNDS
+from .game_config import compile_config
+
+"""
+NumPy arrays mirroring the units on a GameMap, so questions about the whole
+board can be answered with array operations instead of Python loops.
+NumPy is optional, the rest of gamelib works without it.
+"""
+
+
+class BoardPlanes:
+    """A set of 28x28 arrays describing the units on each tile, indexed [x, y] like the GameMap
+
+    Each tile is described by the last unit placed on it, ignoring removal markers. Firewalls never
+    share a tile, so on firewall tiles the planes always describe the firewall.
+
+    The planes are kept in sync by GameMap.add_unit, GameMap.remove_unit and item assignment.
+    Changes made directly to a GameUnit, such as lowering its stability, are not picked up.
+
+    Attributes:
+        * unit_type (int8 array): The index of the unit type in config["unitInformation"], -1 for empty tiles
+        * owner (int8 array): The player index of the unit, -1 for empty tiles
+        * stability (float32 array): The total stability of all units on the tile
+        * pending_removal (bool array): True if the unit on the tile has been flagged for removal
+        * count (int16 array): The number of units on the tile
+        * in_bounds (bool array): True for tiles that are part of the arena
+
+    """
+    def __init__(self, config):
+        """Creates empty planes
+
+        Args:
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+
+        """
+        if np is None:
+            raise ImportError("BoardPlanes requires numpy")
+        game_config = compile_config(config)
+        self._type_codes = game_config.UNIT_TYPE_TO_INDEX
+        self._remove_code = game_config.UNIT_TYPE_TO_INDEX[game_config.REMOVE]
+        self._firewall_codes = sorted(game_config.UNIT_TYPE_TO_INDEX[unit_type] for unit_type in game_config.FIREWALL_TYPES)
+        shape = (ARENA_SIZE, ARENA_SIZE)
+        self.unit_type = np.full(shape, -1, dtype=np.int8)
+        self.owner = np.full(shape, -1, dtype=np.int8)
+        self.stability = np.zeros(shape, dtype=np.float32)
+        self.pending_removal = np.zeros(shape, dtype=bool)
+        self.count = np.zeros(shape, dtype=np.int16)
+        self.in_bounds = np.frombuffer(bytes(IN_BOUNDS), dtype=np.uint8).reshape(shape).astype(bool)
+
+    def copy(self):
+        """Creates an independent copy of the planes
+        """
+        planes = copy.copy(self)
+        planes.unit_type = self.unit_type.copy()
+        planes.owner = self.owner.copy()
+        planes.stability = self.stability.copy()
+        planes.pending_removal = self.pending_removal.copy()
+        planes.count = self.count.copy()
+        return planes
+
+    def type_code(self, unit_type):
+        """The code used for a unit type in the unit_type plane
+
+        Args:
+            * unit_type: A unit type, PING, FILTER, etc.
+
+        Returns:
+            The index of the unit type in config["unitInformation"]
+
+        """
+        return self._type_codes[unit_type]
+
+    def fill(self, units):
+        """Replaces the planes with the given units in one pass
+
+        Args:
+            * units: An iterable of GameUnits, in the order they were placed on the board
+
+        """
+        self.fill_entries((unit.x, unit.y, unit.unit_type, unit.player_index, unit.stability, unit.pending_removal) for unit in units)
+
+    def fill_entries(self, entries):
+        """Replaces the planes in one pass, without needing GameUnits
+
+        Args:
+            * entries: An iterable of (x, y, unit_type, player_index, stability, pending_removal) tuples,
+              in the order the units were placed on the board
+
+        """
+        self.clear()
+        top = {}
+        counts = {}
+        stability = {}
+        pending = set()
+        for x, y, unit_type, player_index, unit_stability, pending_removal in entries:
+            location = (x, y)
+            code = self._type_codes[unit_type]
+            if pending_removal:
+                pending.add(location)
+            if code == self._remove_code:
+                continue
+            top[location] = (code, player_index)
+            counts[location] = counts.get(location, 0) + 1
+            stability[location] = stability.get(location, 0) + unit_stability
+        if top:
+            xs, ys = zip(*top)
+            codes, owners = zip(*top.values())
+            self.unit_type[xs, ys] = codes
+            self.owner[xs, ys] = owners
+            self.count[xs, ys] = [counts[location] for location in top]
+            self.stability[xs, ys] = [stability[location] for location in top]
+        if pending:
+            xs, ys = zip(*pending)
+            self.pending_removal[xs, ys] = True
+
+    def clear(self):
+        """Empties every tile
+        """
+        self.unit_type.fill(-1)
+        self.owner.fill(-1)
+        self.stability.fill(0)
+        self.pending_removal.fill(False)
+        self.count.fill(0)
+
+    def set_tile(self, x, y, units):
+        """Updates a single tile to describe the given units
+
+        Args:
+            * x: The x coordinate of the tile
+            * y: The y coordinate of the tile
+            * units: The units now on the tile
+
+        """
+        code = -1
+        owner = -1
+        count = 0
+        stability = 0
+        pending = False
+        for unit in units:
+            pending = pending or unit.pending_removal
+            unit_code = self._type_codes[unit.unit_type]
+            if unit_code == self._remove_code:
+                continue
+            code = unit_code
+            owner = unit.player_index
+            count += 1
+            stability += unit.stability
+        self.unit_type[x, y] = code
+        self.owner[x, y] = owner
+        self.count[x, y] = count
+        self.stability[x, y] = stability
+        self.pending_removal[x, y] = pending
+
+    def mask(self, unit_type=None, player_index=None):
+        """Finds the tiles holding the given kind of unit
+
+        Args:
+            * unit_type: A unit type or a list of unit types. Any unit type if None
+            * player_index: 0 for your units, 1 for the enemy's. Either player if None
+
+        Returns:
+            A 28x28 boolean array that is True for every matching tile
+
+        """
+        if unit_type is None:
+            result = self.count > 0
+        elif isinstance(unit_type, str):
+            result = self.unit_type == self._type_codes[unit_type]
+        else:
+            result = np.isin(self.unit_type, [self._type_codes[one_type] for one_type in unit_type])
+        if player_index is not None:
+            result &= self.owner == player_index
+        return result
+
+    def firewall_mask(self, player_index=None):
+        """Finds the tiles holding firewalls, see mask
+        """
+        result = np.isin(self.unit_type, self._firewall_codes)
+        if player_index is not None:
+            result &= self.owner == player_index
+        return result
+
+    def half(self, player_index):
+        """A mask of the in bounds tiles on a player's half of the arena, 0 for the bottom half and 1 for the top half
+        """
+        result = self.in_bounds.copy()
+        if player_index == 0:
+            result[:, HALF_ARENA:] = False
+        else:
+            result[:, :HALF_ARENA] = False
+        return result
+
+    def count_units(self, unit_type=None, player_index=None, region=None):
+        """Counts units on the board
+
+        Args:
+            * unit_type: A unit type or a list of unit types. Any unit type if None
+            * player_index: 0 for your units, 1 for the enemy's. Either player if None
+            * region: An optional 28x28 boolean array limiting which tiles are counted
+
+        Returns:
+            The number of matching units
+
+        """
+        selected = self.mask(unit_type, player_index)
+        if region is not None:
+            selected &= region
+        return int(self.count[selected].sum())
+
+    def total_stability(self, unit_type=None, player_index=None, region=None):
+        """Sums the stability of units on the board, for example the total health of the firewalls on your half
+
+        Args:
+            * unit_type: A unit type or a list of unit types. Any unit type if None
+            * player_index: 0 for your units, 1 for the enemy's. Either player if None
+            * region: An optional 28x28 boolean array limiting which tiles are summed
+
+        Returns:
+            The total stability of the matching units
+
+        """
+        selected = self.mask(unit_type, player_index)
+        if region is not None:
+            selected &= region
+        return float(self.stability[selected].sum())
+
+    def locations(self, selected):
+        """Converts a boolean mask into a list of locations
+
+        Args:
+            * selected: A 28x28 boolean array, usually from mask
+
+        Returns:
+            A list of [x, y] locations where the mask is True
+
+        """
+        return [[int(x), int(y)] for x, y in zip(*np.nonzero(selected))]
@@ -0,0 +1,232 @@
+import re
+from array import array
+
+from .util import json_loads
+from .game_config import compile_config
+
+"""
+Tools for the messages the game sends during the action phase. There can be hundreds of
+action frames per round, so messages are classified by looking for their turnInfo with a
+regular expression, and frames are only decoded when something asks for them.
+"""
+
+CONFIG = -1
+UNKNOWN = -2
+TURN = 0
+ACTION_FRAME = 1
+GAME_OVER = 2
+
+_STATE_TYPE = re.compile(r'"turnInfo"\s*:\s*\[\s*(-?\d+)')
+
+
+def message_type(message):
+    """Classifies a message from the game without decoding it
+
+    Args:
+        * message: A line received from the game
+
+    Returns:
+        CONFIG for the config sent at the start of the game, UNKNOWN for messages without a turnInfo,
+        and the state type from turnInfo otherwise: TURN, ACTION_FRAME or GAME_OVER
+
+    """
+    if "replaySave" in message:
+        return CONFIG
+    match = _STATE_TYPE.search(message)
+    if match is not None:
+        return int(match.group(1))
+    if "turnInfo" in message:
+        return int(json_loads(message)["turnInfo"][0])
+    return UNKNOWN
+
+
+class FrameReader:
+    """Reads the action frames of one action phase from the game
+
+    The reader starts at the first frame of the phase and stops at the first message that is not an
+    action frame, which is kept in next_message so it can be handled as usual.
+
+    Attributes:
+        * next_message (str): The message that followed the action phase, None until it has been read
+
+    """
+    def __init__(self, first_frame, read_message):
+        """Starts reading an action phase
+
+        Args:
+            * first_frame: The first action frame message of the phase
+            * read_message: A function returning the next message from the game, such as util.get_command
+
+        """
+        self._read_message = read_message
+        self._frame = first_frame
+        self.next_message = None
+
+    def frames(self):
+        """A generator of the decoded frames of the action phase
+
+        Each frame is only read from the game and decoded when the generator is advanced to it.
+        """
+        while self._frame is not None:
+            frame = self._frame
+            self._frame = None
+            yield json_loads(frame)
+            self.__read()
+
+    def __read(self):
+        message = self._read_message()
+        if message_type(message) == ACTION_FRAME:
+            self._frame = message
+        else:
+            self.next_message = message
+
+    def drain(self):
+        """Skips the rest of the action phase without decoding it
+
+        Returns:
+            The first message after the action phase
+
+        """
+        while self.next_message is None:
+            self._frame = None
+            self.__read()
+        return self.next_message
+
+
+class FrameStore:
+    """A compact record of the units in each action frame, for looking back at an action phase
+
+    Every unit of every added frame becomes one row of a set of flat arrays, so a whole round
+    takes a few bytes per unit instead of a dict per frame.
+
+    Attributes:
+        * frame_numbers (array): The frame number from turnInfo of each stored frame
+        * unit_type (array): The index of the unit type in config["unitInformation"], per row
+        * owner (array): The player index of the unit, per row
+        * x (array): The x coordinate of the unit, per row
+        * y (array): The y coordinate of the unit, per row
+        * stability (array): The stability of the unit, per row
+        * stability_delta (array): The change in stability since the unit was last seen, 0 for its first frame, per row
+        * unit_id (array): The id the game gave the unit, -1 if it is not a number, per row
+
+    """
+    def __init__(self, config):
+        """Creates an empty store
+
+        Args:
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+
+        """
+        self.game_config = compile_config(config)
+        self.clear()
+
+    def clear(self):
+        """Forgets every stored frame
+        """
+        self.frame_numbers = array("i")
+        self._frame_starts = array("i", [0])
+        self.unit_type = array("b")
+        self.owner = array("b")
+        self.x = array("b")
+        self.y = array("b")
+        self.stability = array("f")
+        self.stability_delta = array("f")
+        self.unit_id = array("q")
+        self._last_stability = {}
+
+    def __len__(self):
+        return len(self.frame_numbers)
+
+    def add(self, frame):
+        """Stores the units of a decoded action frame
+
+        Args:
+            * frame: An action frame, decoded from json
+
+        """
+        last_stability = self._last_stability
+        for player_index, units in enumerate((frame["p1Units"], frame["p2Units"])):
+            for code, serialized_units in enumerate(units):
+                for serialized_unit in serialized_units:
+                    stability = float(serialized_unit[2])
+                    unit_id = serialized_unit[3] if len(serialized_unit) > 3 else None
+                    try:
+                        unit_id = int(unit_id)
+                    except (TypeError, ValueError):
+                        unit_id = -1
+                    previous = last_stability.get(unit_id) if unit_id != -1 else None
+                    if unit_id != -1:
+                        last_stability[unit_id] = stability
+                    self.unit_type.append(code)
+                    self.owner.append(player_index)
+                    self.x.append(int(serialized_unit[0]))
+                    self.y.append(int(serialized_unit[1]))
+                    self.stability.append(stability)
+                    self.stability_delta.append(0 if previous is None else stability - previous)
+                    self.unit_id.append(unit_id)
+        self.frame_numbers.append(int(frame["turnInfo"][2]))
+        self._frame_starts.append(len(self.unit_type))
+
+    def rows(self, frame_index):
+        """The rows holding the units of a stored frame
+
+        Args:
+            * frame_index: The position of the frame in the store, 0 for the first frame added
+
+        Returns:
+            A range of row numbers
+
+        """
+        return range(self._frame_starts[frame_index], self._frame_starts[frame_index + 1])
+
+    def units_in_frame(self, frame_index):
+        """The units of a stored frame
+
+        Args:
+            * frame_index: The position of the frame in the store, 0 for the first frame added
+
+        Returns:
+            A list of (unit_type, player_index, x, y, stability) tuples
+
+        """
+        unit_types = self.game_config.unit_types
+        return [(unit_types[self.unit_type[row]], self.owner[row], self.x[row], self.y[row], self.stability[row])
+                for row in self.rows(frame_index)]
+
+    def track(self, unit_id):
+        """Follows one unit through the stored frames
+
+        Args:
+            * unit_id: The id the game gave the unit
+
+        Returns:
+            A list of (frame_index, x, y, stability) tuples, one for every stored frame the unit is in
+
+        """
+        track = []
+        frame_index = 0
+        for row, stored_id in enumerate(self.unit_id):
+            if stored_id != unit_id:
+                continue
+            while row >= self._frame_starts[frame_index + 1]:
+                frame_index += 1
+            track.append((frame_index, self.x[row], self.y[row], self.stability[row]))
+        return track
+
+    def damage_taken(self, player_index, unit_type=None):
+        """The total stability lost by a player's units over the stored frames
+
+        Args:
+            * player_index: 0 for your units, 1 for the enemy's
+            * unit_type: Only count units of this type. Any unit type if None
+
+        Returns:
+            The total stability lost. Units that disappear between frames are not counted
+
+        """
+        code = None if unit_type is None else self.game_config.type_code(unit_type)
+        total = 0
+        for row, delta in enumerate(self.stability_delta):
+            if delta < 0 and self.owner[row] == player_index and (code is None or self.unit_type[row] == code):
+                total -= delta
+        return total
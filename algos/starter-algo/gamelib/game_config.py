@@ -0,0 +1,140 @@
+import weakref
+from collections import namedtuple
+from types import MappingProxyType
+
+"""
+The parts of the game config that gamelib looks up over and over, compiled once into
+immutable tables. A GameConfig holds no per-turn state, so a single instance can be
+shared by every GameState, GameMap and GameUnit built from the same config, including
+game states that are used at the same time.
+"""
+
+"""
+The stats of a unit type. They are the same for every unit of that type, so each type gets a
+single shared record. Stats that do not apply to a type are None, for example speed for the
+removal marker.
+"""
+UnitStats = namedtuple("UnitStats", ["unit_type", "config", "stationary", "speed", "damage", "damage_f", "damage_i", "range", "max_stability", "cost"])
+
+BITS = 0
+CORES = 1
+
+# id(config) -> GameConfig. Entries go away with the last reference to their GameConfig, and a
+# live GameConfig keeps its config alive, so an id is never reused while its entry exists
+_compiled = weakref.WeakValueDictionary()
+
+
+def compile_config(config):
+    """Gets the GameConfig for a config, compiling it the first time the config is seen
+
+    Args:
+        * config (JSON): Contains information about the game. A GameConfig is returned as is
+
+    Returns:
+        The GameConfig. The same instance is returned for every call with the same config object, as long as
+        something still holds on to it
+
+    """
+    if isinstance(config, GameConfig):
+        return config
+    cached = _compiled.get(id(config))
+    if cached is not None and cached.config is config:
+        return cached
+    game_config = GameConfig(config)
+    _compiled[id(config)] = game_config
+    return game_config
+
+
+class GameConfig:
+    """Lookup tables compiled from the game config. Create them with compile_config
+
+    Attributes:
+        * config (JSON): The config the tables were compiled from
+        * FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE (str): The shorthand of each unit type
+        * UNIT_TYPE_TO_INDEX (dict): Maps a unit type to its integer code, its index in config["unitInformation"]
+        * unit_types (tuple): The unit type of each code
+        * ALL_UNITS (frozenset): The unit types that can be spawned
+        * FIREWALL_TYPES (frozenset): The stationary unit types
+        * INFORMATION_TYPES (frozenset): The mobile unit types
+        * unit_stats (dict): Maps a unit type to its UnitStats
+        * costs (tuple): The cost of each unit type, indexed by code
+        * resource_types (tuple): The resource each unit type is paid with, BITS or CORES, indexed by code
+        * attack_damage (tuple): The damage per frame each firewall type deals to information units in range, 0 for
+          firewalls that do not attack and for information units, indexed by code
+        * shield_amount (tuple): The shield each firewall type gives to friendly information units in range, 0 for
+          firewalls that do not shield and for information units, indexed by code
+        * bits_per_round (float): Bits every player gains each round, before the bit schedule
+        * bit_decay_per_round (float): The fraction of unspent bits lost each round
+        * turn_interval_for_bit_schedule (int): Every this many turns, the bits gained per round grows by one
+        * resources (dict): A read only view of config["resources"]
+        * mechanics (dict): A read only view of config["mechanics"]
+        * wait_time_bot_soft (float): Seconds a turn may take before the algo is penalized, None if the config does not say
+        * wait_time_bot_max (float): Seconds a turn may take before the algo times out, None if the config does not say
+
+    """
+    def __init__(self, config):
+        """Compiles the tables. Prefer compile_config, which only compiles each config once
+
+        Args:
+            * config (JSON): Contains information about the game
+
+        """
+        unit_information = config["unitInformation"]
+        set_value = super().__setattr__
+        set_value("config", config)
+        set_value("unit_types", tuple(unit["shorthand"] for unit in unit_information))
+        for name, unit_type in zip(("FILTER", "ENCRYPTOR", "DESTRUCTOR", "PING", "EMP", "SCRAMBLER", "REMOVE"), self.unit_types):
+            set_value(name, unit_type)
+        set_value("UNIT_TYPE_TO_INDEX", MappingProxyType({unit_type: code for code, unit_type in enumerate(self.unit_types)}))
+
+        remove_code = len(unit_information) - 1
+        firewalls = frozenset(unit["shorthand"] for code, unit in enumerate(unit_information) if "speed" not in unit and code < remove_code)
+        set_value("FIREWALL_TYPES", firewalls)
+        set_value("INFORMATION_TYPES", frozenset(unit["shorthand"] for unit in unit_information if "speed" in unit))
+        set_value("ALL_UNITS", self.FIREWALL_TYPES | self.INFORMATION_TYPES)
+
+        stats = {}
+        for unit in unit_information:
+            unit_type = unit["shorthand"]
+            stationary = unit_type in firewalls
+            if stationary:
+                speed = 0
+                damage = unit.get("shieldAmount", unit.get("damage"))
+                damage_f = damage_i = None
+            else:
+                speed = unit.get("speed")
+                damage = None
+                damage_f = unit.get("damageF")
+                damage_i = unit.get("damageI")
+            stats[unit_type] = UnitStats(unit_type, config, stationary, speed, damage, damage_f, damage_i,
+                                         unit.get("range"), unit.get("stability"), unit.get("cost"))
+        set_value("unit_stats", MappingProxyType(stats))
+        set_value("costs", tuple(unit.get("cost") for unit in unit_information))
+        set_value("resource_types", tuple(CORES if unit["shorthand"] in firewalls else BITS for unit in unit_information))
+        set_value("attack_damage", tuple(unit.get("damage", 0) if unit["shorthand"] in firewalls else 0 for unit in unit_information))
+        set_value("shield_amount", tuple(unit.get("shieldAmount", 0) if unit["shorthand"] in firewalls else 0 for unit in unit_information))
+
+        resources = config.get("resources", {})
+        set_value("resources", MappingProxyType(dict(resources)))
+        set_value("mechanics", MappingProxyType(dict(config.get("mechanics", {}))))
+        set_value("bits_per_round", resources.get("bitsPerRound"))
+        set_value("bit_decay_per_round", resources.get("bitDecayPerRound"))
+        set_value("turn_interval_for_bit_schedule", resources.get("turnIntervalForBitSchedule"))
+
+        # The engine gives wait times in milliseconds
+        timing = config.get("timingAndReplay", {})
+        set_value("wait_time_bot_soft", timing["waitTimeBotSoft"] / 1000 if "waitTimeBotSoft" in timing else None)
+        set_value("wait_time_bot_max", timing["waitTimeBotMax"] / 1000 if "waitTimeBotMax" in timing else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GameConfig is immutable")
+
+    def is_stationary(self, unit_type):
+        """Checks if a unit type is a firewall
+        """
+        return unit_type in self.FIREWALL_TYPES
+
+    def type_code(self, unit_type):
+        """The integer code of a unit type, its index in config["unitInformation"]
+        """
+        return self.UNIT_TYPE_TO_INDEX[unit_type]
@@ -1,6 +1,33 @@
+import copy
 import math
+import random
 import warnings
 from .unit import GameUnit
+from .game_config import compile_config
+from .board_planes import BoardPlanes
+from . import geometry
+
+"""
+Zobrist keys. Every tile gets a fixed random 64 bit key. The blocker hash of a map is the XOR
+of the keys of all tiles holding a stationary unit, so it can be updated in O(1) whenever a single
+tile changes and two maps with the same firewall layout always share the same hash.
+
+The board hash covers every unit. Each (unit type, owner, tile) combination gets its own key and
+the keys of all units on the board are added together modulo 2^64. Adding rather than XORing
+keeps stacks of identical information units from cancelling each other out.
+"""
+_MAX_UNIT_TYPES = 8
+_HASH_MASK = (1 << 64) - 1
+_key_generator = random.Random(28)
+_BLOCKER_KEYS = [_key_generator.getrandbits(64) for _ in range(28 * 28)]
+_UNIT_KEYS = [[_key_generator.getrandbits(64) for _ in range(28 * 28)] for _ in range(_MAX_UNIT_TYPES * 2)]
+del _key_generator
+
+
+def _iteration_order(index):
+    """Sort key putting tile indices in the order GameMap iterates over the board
+    """
+    return index % geometry.ARENA_SIZE * geometry.ARENA_SIZE + index // geometry.ARENA_SIZE
 
 class GameMap:
     """Holds data about the current game map and provides functions
@@ -13,22 +40,37 @@ class GameMap:
 
     Attributes:
         * config (JSON): Contains information about the game
+        * game_config (:obj: GameConfig): The compiled config
         * ARENA_SIZE (int): The size of the arena.
         * HALF_ARENA (int): Half of the size of the arena.
         * TOP_RIGHT (int): A constant that represents the top right edge
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challange! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * blocker_hash (int): A hash of the locations holding stationary units. It changes whenever
+          add_unit, remove_unit or item assignment adds or removes a firewall, and is used to key cached paths.
+          Mutating the unit list of a tile directly will not update it.
+        * board_hash (int): A 64 bit Zobrist hash of the type, owner and location of every unit on the map.
+          It is updated by the same functions as blocker_hash, so it can key caches of anything derived from the board.
+        * planes (:obj: BoardPlanes): NumPy arrays kept in sync with the units on the map, None unless enabled
+
+    The map also keeps an index of where each player's units of each type are, see units_of and count,
+    how much damage per frame each tile is under from enemy firewalls, see threat_at and path_damage, and how
+    much shield friendly firewalls give on each tile, see shield_at and path_shielding.
+
+    A map can be forked to create a hypothetical board, see fork.
 
     """
-    def __init__(self, config):
+    def __init__(self, config, planes=False):
         """Initializes constants and game map
 
         Args:
-            * config (JSON): Contains information about the game
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+            * planes: If True, also keep NumPy board planes of the units, see enable_planes. Requires numpy
 
         """
-        self.config = config
+        self.game_config = compile_config(config)
+        self.config = self.game_config.config
         self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
         self.TOP_RIGHT = 0
@@ -36,36 +78,159 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.__occupied = set()
+        self.__stationary = set()
+        self.blocker_hash = 0
+        self.board_hash = 0
+        self.__tile_hashes = [0] * (self.ARENA_SIZE * self.ARENA_SIZE)
+        self.__type_codes = self.game_config.UNIT_TYPE_TO_INDEX
+        self.__stationary_types = self.game_config.FIREWALL_TYPES
+        # Tile index -> units loaded from a serialized game state that have not been turned into GameUnits yet
+        self.__serialized = {}
+        # (player_index, unit_type) -> {tile index: number of units}, and the same counts for each tile
+        self.__kind_index = {}
+        self.__tile_kinds = [None] * (self.ARENA_SIZE * self.ARENA_SIZE)
+        # For each player, the damage per frame enemy firewalls deal to that player's units on each tile,
+        # and the total shield friendly firewalls give to that player's units on each tile
+        self.__threat = [[0] * (self.ARENA_SIZE * self.ARENA_SIZE) for _ in range(2)]
+        self.__shield = [[0] * (self.ARENA_SIZE * self.ARENA_SIZE) for _ in range(2)]
+        # Unit type -> (damage, shield amount, range) for the firewall types that attack or shield
+        self.__coverage_types = {unit_type: (damage, shield, self.game_config.unit_stats[unit_type].range)
+                                 for unit_type, damage, shield in zip(self.game_config.unit_types, self.game_config.attack_damage,
+                                                                      self.game_config.shield_amount) if damage or shield}
+        self.__shield_decay = self.game_config.mechanics.get("shieldDecayPerFrame", 0)
+        self.planes = BoardPlanes(self.config) if planes else None
+        # Tiles whose unit lists this map may modify in place, None if it owns every tile
+        self.__owned = None
+        self.__parent = None
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
             x,y = location
-            return self.__map[x][y]
+            return self.__own_tile(x, y)
         self._invalid_coordinates(location)
 
     def __setitem__(self, location, val):
         if type(location) == tuple and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            self.__replace_tile(x, y, val)
             return
         self._invalid_coordinates(location)
 
+    def fork(self):
+        """Creates a copy of this map for trying out hypothetical changes
+
+        The copy is cheap because tiles are shared until they are touched. A tile is copied, together with
+        its units, the first time either map hands it out or modifies it, so changes to one map never show up
+        in the other. The fork can be thrown away, or its changes written back with commit.
+
+        Returns:
+            A new GameMap with the same units as this one
+
+        """
+        child = copy.copy(self)
+        child.__map = [column[:] for column in self.__map]
+        child.__occupied = set(self.__occupied)
+        child.__stationary = set(self.__stationary)
+        child.__tile_hashes = list(self.__tile_hashes)
+        child.__kind_index = {kind: dict(tiles) for kind, tiles in self.__kind_index.items()}
+        child.__tile_kinds = list(self.__tile_kinds)
+        child.__threat = [list(threat) for threat in self.__threat]
+        child.__shield = [list(shield) for shield in self.__shield]
+        child.__serialized = dict(self.__serialized)
+        child.planes = None if self.planes is None else self.planes.copy()
+        child.__owned = set()
+        child.__parent = self
+        self.__owned = set()
+        return child
+
+    def commit(self):
+        """Writes the changes made to a fork back into the map it was forked from
+
+        The fork can keep being used afterwards, it stays independent from the map it was committed to.
+        """
+        parent = self.__parent
+        if parent is None:
+            warnings.warn("Only a map created by fork can be committed.")
+            return
+        parent.__map = [column[:] for column in self.__map]
+        parent.__occupied = set(self.__occupied)
+        parent.__stationary = set(self.__stationary)
+        parent.blocker_hash = self.blocker_hash
+        parent.board_hash = self.board_hash
+        parent.__tile_hashes = list(self.__tile_hashes)
+        parent.__kind_index = {kind: dict(tiles) for kind, tiles in self.__kind_index.items()}
+        parent.__tile_kinds = list(self.__tile_kinds)
+        parent.__threat = [list(threat) for threat in self.__threat]
+        parent.__shield = [list(shield) for shield in self.__shield]
+        parent.__serialized = dict(self.__serialized)
+        if parent.planes is not None or self.planes is not None:
+            parent.planes = None if self.planes is None else self.planes.copy()
+        parent.__owned = set()
+        self.__owned = set()
+
+    def __own_tile(self, x, y):
+        """Returns the unit list of a tile, first copying it if it is still shared with another map
+        """
+        if self.__serialized and x * self.ARENA_SIZE + y in self.__serialized:
+            self.__materialize(x, y)
+        tile = self.__map[x][y]
+        if self.__owned is not None and (x, y) not in self.__owned:
+            tile = [copy.copy(unit) for unit in tile]
+            self.__map[x][y] = tile
+            self.__owned.add((x, y))
+        return tile
+
+    def __materialize(self, x, y):
+        """Creates the GameUnits of a tile loaded by _load_serialized
+        """
+        self.__map[x][y] = self.__create_units(x, y, self.__serialized.pop(x * self.ARENA_SIZE + y))
+        if self.__owned is not None:
+            self.__owned.add((x, y))
+
+    def __create_units(self, x, y, entries):
+        tile = []
+        for unit_type, player_index, stability, pending_removal in entries:
+            unit = GameUnit(unit_type, self.game_config, player_index, stability, x, y)
+            unit.pending_removal = pending_removal
+            tile.append(unit)
+        return tile
+
+    def __replace_tile(self, x, y, units):
+        self.__serialized.pop(x * self.ARENA_SIZE + y, None)
+        self.__map[x][y] = units
+        if self.__owned is not None:
+            self.__owned.add((x, y))
+        self.__tile_changed(x, y)
+
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        """Iterates over every location on the board, row by row starting from the bottom.
+        Each loop gets its own generator, so loops over the map can be nested.
+        """
+        for index in geometry.ARENA_TILES:
+            yield list(divmod(index, self.ARENA_SIZE))
+
+    def iter_occupied(self):
+        """Iterates over the locations holding at least one unit, in the same order as iterating over the map
+
+        Only occupied tiles are visited, so this is cheap on a mostly empty board.
+        """
+        for index in sorted(self.__occupied, key=_iteration_order):
+            x, y = divmod(index, self.ARENA_SIZE)
+            if self.__map[x][y] or index in self.__serialized:
+                yield [x, y]
+
+    def iter_stationary(self, player_index=None):
+        """Iterates over the locations holding a stationary unit, in the same order as iterating over the map
+
+        Args:
+            * player_index: Only visit firewalls belonging to this player, 0 for you 1 for the enemy. Both players if None
+
+        """
+        for index in sorted(self.__stationary, key=_iteration_order):
+            if player_index is None or any(owner == player_index and unit_type in self.__stationary_types
+                                           for owner, unit_type in self.__tile_kinds[index]):
+                yield list(divmod(index, self.ARENA_SIZE))
 
     def __empty_grid(self):
         grid = []
@@ -75,6 +240,365 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __tile_changed(self, x, y):
+        """Updates everything derived from the units on a tile after they change
+        """
+        units = self.__map[x][y]
+        self.__update_tile(x * self.ARENA_SIZE + y, [(unit.player_index, unit.unit_type) for unit in units])
+        if self.planes is not None:
+            self.planes.set_tile(x, y, units)
+
+    def __update_tile(self, index, kinds):
+        """Updates the blocker hash, board hash, unit index, threat and shield coverage of a tile
+
+        Args:
+            * index: The flat index of the tile
+            * kinds: A (player_index, unit_type) pair for every unit now on the tile
+
+        """
+        blocked = False
+        tile_hash = 0
+        counts = {}
+        for kind in kinds:
+            player_index, unit_type = kind
+            blocked = blocked or unit_type in self.__stationary_types
+            tile_hash += _UNIT_KEYS[self.__type_codes[unit_type] * 2 + player_index][index]
+            counts[kind] = counts.get(kind, 0) + 1
+        if blocked != (index in self.__stationary):
+            self.blocker_hash ^= _BLOCKER_KEYS[index]
+            if blocked:
+                self.__stationary.add(index)
+            else:
+                self.__stationary.discard(index)
+        if kinds:
+            self.__occupied.add(index)
+        else:
+            self.__occupied.discard(index)
+        self.board_hash = (self.board_hash + tile_hash - self.__tile_hashes[index]) & _HASH_MASK
+        self.__tile_hashes[index] = tile_hash
+
+        old_counts = self.__tile_kinds[index] or {}
+        for kind, number in old_counts.items():
+            if kind not in counts:
+                del self.__kind_index[kind][index]
+            if kind[1] in self.__coverage_types and counts.get(kind) != number:
+                self.__add_coverage(index, kind, -number)
+        for kind, number in counts.items():
+            self.__kind_index.setdefault(kind, {})[index] = number
+            if kind[1] in self.__coverage_types and old_counts.get(kind) != number:
+                self.__add_coverage(index, kind, number)
+        self.__tile_kinds[index] = counts or None
+
+    def __add_coverage(self, index, kind, number):
+        """Adds the damage and shield of a number of firewalls on a tile to every tile in their range, or takes them away if number is negative
+        """
+        player_index, unit_type = kind
+        damage, shield, unit_range = self.__coverage_types[unit_type]
+        damage *= number
+        shield *= number
+        threat = self.__threat[1 - player_index]
+        shielded = self.__shield[player_index]
+        x, y = divmod(index, self.ARENA_SIZE)
+        for target_x, target_y in geometry.locations_in_range(x, y, unit_range):
+            target = target_x * self.ARENA_SIZE + target_y
+            threat[target] += damage
+            shielded[target] += shield
+
+    def _load_serialized(self, units_by_player):
+        """Loads the units of a serialized game state onto an empty map, used when parsing the game state.
+
+        GameUnits are only created for a tile the first time it is handed out. The hashes, the unit index
+        and the board planes are built straight from the serialized units.
+
+        Args:
+            * units_by_player: The serialized units of each player, p1Units then p2Units. Each is a list with,
+              for every unit type in config["unitInformation"], a list of [x, y, stability, ...] units
+
+        """
+        self.__load_grouped(self.__group_serialized(units_by_player))
+
+    def _load_entries(self, entries):
+        """Loads units onto an empty map without creating GameUnits, keeping the order of the units on each tile
+
+        Args:
+            * entries: An (x, y, unit_type, player_index, stability, pending_removal) tuple for every unit, see _snapshot_entries
+
+        """
+        grouped = {}
+        for x, y, unit_type, player_index, stability, pending_removal in entries:
+            grouped.setdefault(x * self.ARENA_SIZE + y, []).append([unit_type, player_index, stability, pending_removal])
+        self.__load_grouped(grouped)
+
+    def _snapshot_entries(self):
+        """Every unit on the map as an (x, y, unit_type, player_index, stability, pending_removal) tuple,
+        in the same order as iterating over the map, without creating GameUnits
+        """
+        return list(self.__all_entries())
+
+    def __load_grouped(self, grouped):
+        self.__serialized = grouped
+        for index, entries in grouped.items():
+            self.__update_tile(index, [(entry[1], entry[0]) for entry in entries])
+        if self.planes is not None:
+            self.planes.fill_entries(self.__all_entries())
+
+    def _apply_serialized(self, units_by_player):
+        """Changes the map to match a serialized game state, such as the next turn of the game.
+
+        Only tiles whose units differ from the serialized units are replaced. Everything derived from
+        the other tiles, including the hashes, the unit index and the board planes, is left alone, so
+        caches keyed by blocker_hash or board_hash keep working when the board did not change.
+
+        Args:
+            * units_by_player: The serialized units of each player, in the same format as _load_serialized
+
+        Returns:
+            The locations of the tiles that were replaced
+
+        """
+        serialized = self.__group_serialized(units_by_player)
+        changed = []
+        for index in sorted(self.__occupied | serialized.keys(), key=_iteration_order):
+            entries = serialized.get(index, [])
+            if self.__tile_signature(index) == self.__signature(entries):
+                continue
+            x, y = divmod(index, self.ARENA_SIZE)
+            self.__replace_tile(x, y, self.__create_units(x, y, entries))
+            changed.append([x, y])
+        return changed
+
+    def __group_serialized(self, units_by_player):
+        """Groups serialized units by tile, as [unit_type, player_index, stability, pending_removal] entries
+        """
+        unit_types = self.game_config.unit_types
+        grouped = {}
+        for player_index, units in enumerate(units_by_player):
+            first_on_tile = {}
+            for code, serialized_units in enumerate(units):
+                unit_type = unit_types[code]
+                for serialized_unit in serialized_units:
+                    x, y = int(serialized_unit[0]), int(serialized_unit[1])
+                    index = x * self.ARENA_SIZE + y
+                    # This depends on RM always being the last type to be processed
+                    if unit_type == self.game_config.REMOVE:
+                        first_on_tile[index][3] = True
+                    entry = [unit_type, player_index, float(serialized_unit[2]), False]
+                    first_on_tile.setdefault(index, entry)
+                    grouped.setdefault(index, []).append(entry)
+        return grouped
+
+    def __signature(self, entries):
+        """What a tile holding the given entries looks like, with stability filled in the same way GameUnit does
+        """
+        unit_stats = self.game_config.unit_stats
+        return [(unit_type, player_index, stability or unit_stats[unit_type].max_stability, pending_removal)
+                for unit_type, player_index, stability, pending_removal in entries]
+
+    def __tile_signature(self, index):
+        entries = self.__serialized.get(index)
+        if entries is not None:
+            return self.__signature(entries)
+        x, y = divmod(index, self.ARENA_SIZE)
+        return [(unit.unit_type, unit.player_index, unit.stability, unit.pending_removal) for unit in self.__map[x][y]]
+
+    def __all_entries(self):
+        """Every unit on the map as a tuple for BoardPlanes.fill_entries, without creating GameUnits
+        """
+        for x, y in self.iter_occupied():
+            entries = self.__serialized.get(x * self.ARENA_SIZE + y)
+            if entries is None:
+                for unit in self.__map[x][y]:
+                    yield (x, y, unit.unit_type, unit.player_index, unit.stability, unit.pending_removal)
+                continue
+            for unit_type, player_index, stability, pending_removal in entries:
+                # GameUnit gives units without a stability their full stability
+                yield (x, y, unit_type, player_index, stability or self.game_config.unit_stats[unit_type].max_stability or 0, pending_removal)
+
+    def enable_planes(self):
+        """Starts keeping NumPy board planes of the units on this map. Requires numpy
+
+        Returns:
+            The BoardPlanes, filled with the units currently on the map
+
+        """
+        if self.planes is None:
+            self.planes = BoardPlanes(self.config)
+            self.planes.fill_entries(self.__all_entries())
+        return self.planes
+
+    def is_blocked(self, location):
+        """Checks if a location holds a stationary unit without handing out the tile
+
+        Args:
+            * location: A map location
+
+        Returns:
+            True if there is a stationary unit at the location, False otherwise
+
+        """
+        x, y = location
+        return x * self.ARENA_SIZE + y in self.__stationary and self.in_arena_bounds(location)
+
+    def units_of(self, player_index, unit_type):
+        """Finds every unit of a given type belonging to a player, without scanning the board
+
+        Args:
+            * player_index: 0 for your units, 1 for the enemy's
+            * unit_type: The type of unit to find, PING, FILTER, etc.
+
+        Returns:
+            A list of GameUnits, in the same order as iterating over the map
+
+        """
+        tiles = self.__kind_index.get((player_index, unit_type))
+        if not tiles:
+            return []
+        units = []
+        for index in sorted(tiles, key=_iteration_order):
+            x, y = divmod(index, self.ARENA_SIZE)
+            for unit in self.__own_tile(x, y):
+                if unit.player_index == player_index and unit.unit_type == unit_type:
+                    units.append(unit)
+        return units
+
+    def locations_of(self, player_index, unit_type):
+        """Finds the locations holding units of a given type belonging to a player, see units_of
+
+        Returns:
+            A list of [x, y] locations, in the same order as iterating over the map
+
+        """
+        tiles = self.__kind_index.get((player_index, unit_type), ())
+        return [list(divmod(index, self.ARENA_SIZE)) for index in sorted(tiles, key=_iteration_order)]
+
+    def count(self, player_index, unit_type):
+        """Counts the units of a given type belonging to a player
+
+        Args:
+            * player_index: 0 for your units, 1 for the enemy's
+            * unit_type: The type of unit to count, PING, FILTER, etc.
+
+        Returns:
+            The number of matching units on the map
+
+        """
+        tiles = self.__kind_index.get((player_index, unit_type))
+        return sum(tiles.values()) if tiles else 0
+
+    def threat_at(self, location, player_index):
+        """The damage per frame enemy firewalls deal to a unit of a player at a location
+
+        Kept up to date as firewalls are added and removed, so this is a single lookup.
+
+        Args:
+            * location: A map location
+            * player_index: The player the unit belongs to, 0 for you 1 for the enemy
+
+        Returns:
+            The total damage per frame of every enemy firewall that can reach the location
+
+        """
+        x, y = location
+        return self.__threat[player_index][x * self.ARENA_SIZE + y]
+
+    def threat_map(self, player_index):
+        """The damage per frame enemy firewalls deal to a unit of a player on every tile, see threat_at
+
+        Returns:
+            A list of 28 columns of 28 values, indexed [x][y] like the map. Tiles outside the arena are 0
+
+        """
+        threat = self.__threat[player_index]
+        return [threat[x * self.ARENA_SIZE:(x + 1) * self.ARENA_SIZE] for x in range(self.ARENA_SIZE)]
+
+    def path_damage(self, path, player_index, speed):
+        """Estimates the damage a unit takes from enemy firewalls while walking a path
+
+        The unit spends 1 / speed frames on every location of the path and takes the threat of
+        each location every frame. Shields, the unit's stability and firewalls destroyed along
+        the way are not taken into account.
+
+        Args:
+            * path: A list of locations, such as a path from GameState.find_path_to_edge
+            * player_index: The player the unit belongs to, 0 for you 1 for the enemy
+            * speed: The speed of the unit, see GameUnit.speed
+
+        Returns:
+            The total damage the unit would take
+
+        """
+        if not speed or speed <= 0:
+            warnings.warn("Passed speed {} to path_damage. Expected a positive number.".format(speed))
+            return 0
+        threat = self.__threat[player_index]
+        return sum(threat[x * self.ARENA_SIZE + y] for x, y in path) / speed
+
+    def shield_at(self, location, player_index):
+        """The total shield friendly firewalls give to a unit of a player at a location
+
+        Kept up to date as firewalls are added and removed, so this is a single lookup.
+
+        Args:
+            * location: A map location
+            * player_index: The player the unit belongs to, 0 for you 1 for the enemy
+
+        Returns:
+            The sum of the shield amounts of every friendly firewall that can reach the location
+
+        """
+        x, y = location
+        return self.__shield[player_index][x * self.ARENA_SIZE + y]
+
+    def shield_map(self, player_index):
+        """The total shield friendly firewalls give to a unit of a player on every tile, see shield_at
+
+        Returns:
+            A list of 28 columns of 28 values, indexed [x][y] like the map. Tiles outside the arena are 0
+
+        """
+        shield = self.__shield[player_index]
+        return [shield[x * self.ARENA_SIZE:(x + 1) * self.ARENA_SIZE] for x in range(self.ARENA_SIZE)]
+
+    def path_shielding(self, path, player_index, speed):
+        """Follows the shield of a unit walking a path
+
+        Each friendly encryptor shields the unit once, when the unit first comes into its range,
+        and the shield then loses mechanics.shieldDecayPerFrame every frame. The unit spends 1 / speed frames
+        on every location of the path. Damage taken along the way is not taken into account.
+
+        Args:
+            * path: A list of locations, such as a path from GameState.find_path_to_edge
+            * player_index: The player the unit belongs to, 0 for you 1 for the enemy
+            * speed: The speed of the unit, see GameUnit.speed
+
+        Returns:
+            A list with the shield the unit has on arriving at each location of the path
+
+        """
+        if not speed or speed <= 0:
+            warnings.warn("Passed speed {} to path_shielding. Expected a positive number.".format(speed))
+            return []
+        coverage = self.__shield[player_index]
+        decay = self.__shield_decay / speed
+        shield = 0
+        used = set()
+        shields = []
+        for step, (x, y) in enumerate(path):
+            if step:
+                shield = max(0, shield - decay)
+            if coverage[x * self.ARENA_SIZE + y]:
+                for unit_type, (_, amount, unit_range) in self.__coverage_types.items():
+                    tiles = self.__kind_index.get((player_index, unit_type)) if amount else None
+                    if not tiles:
+                        continue
+                    for source_x, source_y in geometry.locations_in_range(x, y, unit_range):
+                        source = source_x * self.ARENA_SIZE + source_y
+                        if source in tiles and source not in used:
+                            used.add(source)
+                            shield += amount * tiles[source]
+            shields.append(shield)
+        return shields
+
     def _invalid_coordinates(self, location):
         warnings.warn("{} is out of bounds.".format(str(location)))
 
@@ -89,19 +613,10 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        try:
+            return 0 <= x < self.ARENA_SIZE and 0 <= y < self.ARENA_SIZE and geometry.IN_BOUNDS[x * self.ARENA_SIZE + y] == 1
+        except TypeError:
+            return geometry.in_bounds(x, y)
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -120,8 +635,7 @@ class GameMap:
         if not quadrant_description in [self.TOP_LEFT, self.TOP_RIGHT, self.BOTTOM_LEFT, self.BOTTOM_RIGHT]:
             warnings.warn("Passed invalid quadrent_description '{}'. See the documentation for valid inputs for get_edge_locations.".format(quadrant_description))
 
-        edges = self.get_edges()
-        return edges[quadrant_description]
+        return [[x, y] for x, y in geometry.EDGE_LOCATIONS[quadrant_description]]
 
     def get_edges(self):
         """Gets all of the edges and their edge locations
@@ -130,28 +644,22 @@ class GameMap:
             A list with four lists inside of it of locations corresponding to the four edges.
             [0] = top_right, [1] = top_left, [2] = bottom_left, [3] = bottom_right.
         """
-        top_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = self.ARENA_SIZE - 1 - num
-            top_right.append([int(x), int(y)])
-        top_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = self.ARENA_SIZE - 1 - num
-            top_left.append([int(x), int(y)])
-        bottom_left = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA - 1 - num
-            y = num
-            bottom_left.append([int(x), int(y)])
-        bottom_right = []
-        for num in range(0, self.HALF_ARENA):
-            x = self.HALF_ARENA + num
-            y = num
-            bottom_right.append([int(x), int(y)])
-        return [top_right, top_left, bottom_left, bottom_right]
-    
+        return [[[x, y] for x, y in edge] for edge in geometry.EDGE_LOCATIONS]
+
+    def get_edge_of(self, location):
+        """Finds the edge a location lies on
+
+        Args:
+            * location: A map location
+
+        Returns:
+            The edge constant, GameMap.TOP_RIGHT etc., or -1 if the location is not on an edge
+
+        """
+        x, y = location
+        index = geometry.tile_index(x, y)
+        return -1 if index == -1 else geometry.EDGE_OF[index]
+
     def add_unit(self, unit_type, location, player_index=0):
         """Add a single GameUnit to the map at the given location.
 
@@ -169,11 +677,12 @@ class GameMap:
             warnings.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
-        new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1])
+        new_unit = GameUnit(unit_type, self.game_config, player_index, None, location[0], location[1])
         if not new_unit.stationary:
-            self.__map[x][y].append(new_unit)
+            self.__own_tile(x, y).append(new_unit)
+            self.__tile_changed(x, y)
         else:
-            self.__map[x][y] = [new_unit]
+            self.__replace_tile(x, y, [new_unit])
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -188,7 +697,7 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
-        self.__map[x][y] = []
+        self.__replace_tile(x, y, [])
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -198,7 +707,8 @@ class GameMap:
             * radius: The radius of our search area
 
         Returns:
-            The locations that are within our search area
+            The locations that are within our search area. Results for in bounds locations are served
+            from a table that is built once per location and radius.
 
         """
         if radius < 0 or radius > self.ARENA_SIZE:
@@ -207,6 +717,9 @@ class GameMap:
             self._invalid_coordinates(location)
 
         x, y = location
+        if type(x) == int and type(y) == int and self.in_arena_bounds(location):
+            return [[i, j] for i, j in geometry.locations_in_range(x, y, radius)]
+
         locations = []
         for i in range(int(x - radius), int(x + radius + 1)):
             for j in range(int(y - radius), int(y + radius + 1)):
@@ -230,4 +743,7 @@ class GameMap:
         x1, y1 = location_1
         x2, y2 = location_2
 
-        return math.sqrt((x1 - x2)**2 + (y1 - y2)**2)
+        squared = (x1 - x2)**2 + (y1 - y2)**2
+        if type(squared) == int and squared < len(geometry.DISTANCES):
+            return geometry.DISTANCES[squared]
+        return math.sqrt(squared)
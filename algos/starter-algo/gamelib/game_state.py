@@ -1,14 +1,13 @@
+import copy
 import math
 import json
 import warnings
 
-from .navigation import ShortestPathFinder
-from .util import send_command, debug_write
-from .unit import GameUnit
+from .navigation import ShortestPathFinder, PathCache, DynamicPathField
+from .util import send_command, debug_write, json_loads
 from .game_map import GameMap
-
-def is_stationary(unit_type):
-    return unit_type in FIREWALL_TYPES
+from .game_config import compile_config, BITS, CORES
+from . import snapshot
 
 class GameState:
     """Represents the entire gamestate for a given turn
@@ -22,7 +21,10 @@ class GameState:
         * PING (str): A constant representing the ping unit
         * EMP (str): A constant representing the emp unit
         * SCRAMBLER (str): A constant representing the scrambler unit
-        * FIREWALL_TYPES (list): A list of the firewall units
+        * REMOVE (str): A constant representing the removal of a firewall
+        * FIREWALL_TYPES (frozenset): The firewall units
+        * ALL_UNITS (frozenset): Every unit that can be spawned
+        * game_config (:obj: GameConfig): The compiled config the constants above come from
 
         * ARENA_SIZE (int): The size of the arena
         * HALF_ARENA (int): Half the size of the arena
@@ -35,60 +37,66 @@ class GameState:
         * my_time (int): The time you took to submit your previous turn
         * enemy_health (int): Your opponents current remaining health
         * enemy_time (int): Your opponents current remaining time
+        * path_cache (:obj: PathCache): Paths found by find_path_to_edge, with hit and miss counters
     """
 
-    def __init__(self, config, serialized_string):
+    def __init__(self, config, serialized_string, planes=False, state=None):
         """ Setup a turns variables using arguments passed
 
         Args:
-            * config (JSON): A json object containing information about the game
+            * config (JSON): A json object containing information about the game, or a GameConfig compiled from it
             * serialized_string (string): A string containing information about the game state at the start of this turn
+            * planes: If True, keep NumPy board planes of the units on the game map. Requires numpy
+            * state (dict): The serialized_string already decoded from json, such as AlgoCore.turn_state, so it is not decoded again
 
         """
         self.serialized_string = serialized_string
-        self.config = config
-
-        global FILTER, ENCRYPTOR, DESTRUCTOR, PING, EMP, SCRAMBLER, REMOVE, FIREWALL_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        FILTER = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[FILTER] = 0
-        ENCRYPTOR = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[ENCRYPTOR] = 1
-        DESTRUCTOR = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DESTRUCTOR] = 2
-        PING = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[PING] = 3
-        EMP = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[EMP] = 4
-        SCRAMBLER = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCRAMBLER] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-
-        ALL_UNITS = [PING, EMP, SCRAMBLER, FILTER, ENCRYPTOR, DESTRUCTOR]
-        FIREWALL_TYPES = [FILTER, ENCRYPTOR, DESTRUCTOR]
+        game_config = compile_config(config)
+        self.game_config = game_config
+        self.config = game_config.config
+
+        self.UNIT_TYPE_TO_INDEX = game_config.UNIT_TYPE_TO_INDEX
+        self.FILTER = game_config.FILTER
+        self.ENCRYPTOR = game_config.ENCRYPTOR
+        self.DESTRUCTOR = game_config.DESTRUCTOR
+        self.PING = game_config.PING
+        self.EMP = game_config.EMP
+        self.SCRAMBLER = game_config.SCRAMBLER
+        self.REMOVE = game_config.REMOVE
+        self.ALL_UNITS = game_config.ALL_UNITS
+        self.FIREWALL_TYPES = game_config.FIREWALL_TYPES
 
         self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
-        self.BITS = 0
-        self.CORES = 1
+        self.BITS = BITS
+        self.CORES = CORES
 
-        self.game_map = GameMap(self.config)
+        self.game_map = GameMap(game_config, planes)
         self._shortest_path_finder = ShortestPathFinder()
+        self.path_cache = PathCache()
+        self.__parent = None
         self._build_stack = []
         self._deploy_stack = []
         self._player_resources = [
                 {'cores': 0, 'bits': 0},  # player 0, which is you
                 {'cores': 0, 'bits': 0}]  # player 1, which is the opponent
-        self.__parse_state(serialized_string)
+        self.__parse_state(serialized_string, state)
 
-    def __parse_state(self, state_line):
+    def __parse_state(self, state_line, state=None):
         """
         Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        state is the same game state already decoded, if the caller has it.
+        GameUnits are only created when a tile of the map is first accessed, see GameMap._load_serialized.
         """
-        state = json.loads(state_line)
+        if state is None:
+            state = json_loads(state_line)
+        self.__parse_stats(state)
+        self.game_map._load_serialized([state["p1Units"], state["p2Units"]])
 
+    def __parse_stats(self, state):
+        """
+        Reads the turn number, health, time and resources of both players from a decoded game state.
+        """
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
 
@@ -104,31 +112,31 @@ class GameState:
             {'cores': p1_cores, 'bits': p1_bits},
             {'cores': p2_cores, 'bits': p2_bits}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
+    def update(self, serialized_string, state=None):
+        """Moves this game state on to a new turn, instead of building a new GameState
 
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
+        Only the tiles whose units changed since the last turn are replaced, see GameMap._apply_serialized.
+        The path finder and the path cache are kept, and cached paths stay valid for as long as the
+        firewall layout they were found on. Spawns queued on the previous turn are discarded.
+
+        Args:
+            * serialized_string (string): The game state of the new turn
+            * state (dict): The serialized_string already decoded from json, so it is not decoded again
+
+        Returns:
+            The locations of the tiles whose units changed
 
-    def __create_parsed_units(self, units, player_number):
-        """
-        Helper function for __parse_state to add units to the map.
         """
-        typedef = self.config.get("unitInformation")
-        for i, unit_types in enumerate(units):
-            for uinfo in unit_types:
-                unit_type = typedef[i].get("shorthand")
-                sx, sy, shp = uinfo[:3]
-                x, y = map(int, [sx, sy])
-                hp = float(shp)
-                # This depends on RM always being the last type to be processed
-                if unit_type == REMOVE:
-                    self.game_map[x,y][0].pending_removal = True
-                unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                self.game_map[x,y].append(unit)
+        if state is None:
+            state = json_loads(serialized_string)
+        self.serialized_string = serialized_string
+        self.__parse_stats(state)
+        self._build_stack = []
+        self._deploy_stack = []
+        return self.game_map._apply_serialized([state["p1Units"], state["p2Units"]])
 
     def __resource_required(self, unit_type):
-        return self.CORES if is_stationary(unit_type) else self.BITS
+        return self.game_config.resource_types[self.UNIT_TYPE_TO_INDEX[unit_type]]
 
     def __set_resource(self, resource_type, amount, player_index=0):
         """
@@ -191,7 +199,7 @@ class GameState:
             The number of units affordable of the given unit_type.
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
 
@@ -223,8 +231,8 @@ class GameState:
         bits = self.get_resource(self.BITS, player_index) if not current_bits else current_bits
         for increment in range(1, turns_in_future + 1):
             current_turn = self.turn_number + increment
-            bits *= (1 - self.config["resources"]["bitDecayPerRound"])
-            bits_gained = self.config["resources"]["bitsPerRound"] + (current_turn // self.config["resources"]["turnIntervalForBitSchedule"])
+            bits *= (1 - self.game_config.bit_decay_per_round)
+            bits_gained = self.game_config.bits_per_round + (current_turn // self.game_config.turn_interval_for_bit_schedule)
             bits += bits_gained
             bits = round(bits, 1)
         return bits
@@ -239,12 +247,11 @@ class GameState:
             The units cost
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
 
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
-        return unit_def.get('cost')
+        return self.game_config.costs[self.UNIT_TYPE_TO_INDEX[unit_type]]
 
     def can_spawn(self, unit_type, location, num=1):
         """Check if we can spawn a unit at a location. 
@@ -262,7 +269,7 @@ class GameState:
             True if we can spawn the unit(s)
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         
@@ -270,10 +277,10 @@ class GameState:
             return False
 
         affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
+        stationary = unit_type in self.FIREWALL_TYPES
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = self.game_map.get_edge_of(location) in (self.game_map.BOTTOM_LEFT, self.game_map.BOTTOM_RIGHT)
 
         return (affordable and correct_territory and not blocked and
                 (stationary or on_edge) and
@@ -291,7 +298,7 @@ class GameState:
             The number of units successfully spawned
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         if num < 1:
@@ -309,7 +316,7 @@ class GameState:
                     resource_type = self.__resource_required(unit_type)
                     self.__set_resource(resource_type, 0 - cost)
                     self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
+                    if unit_type in self.FIREWALL_TYPES:
                         self._build_stack.append((unit_type, x, y))
                     else:
                         self._deploy_stack.append((unit_type, x, y))
@@ -334,7 +341,7 @@ class GameState:
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
-                self._build_stack.append((REMOVE, x, y))
+                self._build_stack.append((self.REMOVE, x, y))
                 removed_units += 1
             else:
                 warnings.warn("Could not remove a unit from {}. Location has no firewall or is enemy territory.".format(location))
@@ -349,14 +356,75 @@ class GameState:
 
         Returns:
             A list of locations corresponding to the path the unit would take 
-            to get from it's starting location to the best available end location
+            to get from it's starting location to the best available end location.
+            Paths are cached until a firewall is added or removed, see path_cache.
 
         """
         if self.contains_stationary_unit(start_location):
             warnings.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
             return
+        key = (self.game_map.blocker_hash, start_location[0], start_location[1], target_edge)
+        path = self.path_cache.get(key)
+        if path is None:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            path = self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+            self.path_cache.put(key, path)
+        return path
+
+    def find_paths_from_edges(self, start_edges, target_edge):
+        """Gets the paths units spawned at every location of one or more edges would take
+
+        This is much faster than calling find_path_to_edge for every location, since
+        the distance field towards the target is only computed once per pocket of pathable space.
+
+        Args:
+            * start_edges: An edge, or a list of edges, whose locations units start from. game_map.BOTTOM_LEFT, etc.
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A list with one path per start location, in the order the locations are returned by
+            get_edge_locations for each of the start edges. Blocked start locations get None.
+
+        """
+        if type(start_edges) == int:
+            start_edges = [start_edges]
+        start_locations = []
+        for edge in start_edges:
+            start_locations += self.game_map.get_edge_locations(edge)
+
+        blocker_hash = self.game_map.blocker_hash
+        paths = []
+        missing = []
+        for location in start_locations:
+            path = self.path_cache.get((blocker_hash, location[0], location[1], target_edge))
+            if path is None:
+                missing.append(len(paths))
+            paths.append(path)
+
+        if missing:
+            end_points = self.game_map.get_edge_locations(target_edge)
+            found = self._shortest_path_finder.navigate_from_multiple_starts([start_locations[i] for i in missing], end_points, self)
+            for i, path in zip(missing, found):
+                if path is not None:
+                    location = start_locations[i]
+                    self.path_cache.put((blocker_hash, location[0], location[1], target_edge), path)
+                paths[i] = path
+        return paths
+
+    def create_path_field(self, target_edge):
+        """Creates a distance field towards an edge that can be updated one firewall at a time
+
+        Useful when trying out many single firewall changes, see DynamicPathField.block and DynamicPathField.unblock.
+
+        Args:
+            * target_edge: The edge the units want to reach. game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            A DynamicPathField for the current firewall layout
+
+        """
         end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        return DynamicPathField(self, end_points)
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked
@@ -368,11 +436,88 @@ class GameState:
             True if there is a stationary unit at the location, False otherwise
         """
         x, y = map(int, location)
+        if not self.game_map.is_blocked([x, y]):
+            return False
         for unit in self.game_map[x,y]:
             if unit.stationary:
                 return unit
         return False
 
+    def fork(self):
+        """Creates a copy of this game state for trying out hypothetical turns
+
+        The game map is forked, see GameMap.fork, and resources and queued spawns are copied, so
+        spawning units on the fork leaves this game state untouched. Cached paths are shared.
+
+        Returns:
+            A new game state that can be discarded or written back with commit
+
+        """
+        child = copy.copy(self)
+        child.game_map = self.game_map.fork()
+        child._build_stack = list(self._build_stack)
+        child._deploy_stack = list(self._deploy_stack)
+        child._player_resources = [dict(resources) for resources in self._player_resources]
+        child.__parent = self
+        return child
+
+    def commit(self):
+        """Writes the map, resources and queued spawns of a fork back into the game state it was forked from
+        """
+        parent = self.__parent
+        if parent is None:
+            warnings.warn("Only a game state created by fork can be committed.")
+            return
+        self.game_map.commit()
+        parent._build_stack = list(self._build_stack)
+        parent._deploy_stack = list(self._deploy_stack)
+        parent._player_resources = [dict(resources) for resources in self._player_resources]
+
+    def to_bytes(self):
+        """Packs this game state into a compact binary snapshot
+
+        The snapshot holds the turn number, the health, resources and time of both players, every unit
+        on the map with its stability and removal flag, and the queued spawns. See gamelib/snapshot.py
+        for the layout. Two game states with the same units in the same order give the same bytes.
+
+        Returns:
+            The snapshot as bytes
+
+        """
+        return snapshot.to_bytes(self)
+
+    def to_shared_memory(self, name=None):
+        """Packs this game state into a new block of shared memory, for handing it to other processes
+
+        Args:
+            * name: The name of the block. A unique name is chosen if None
+
+        Returns:
+            A multiprocessing.shared_memory.SharedMemory. The caller closes and unlinks it when it is no longer needed
+
+        """
+        return snapshot.to_shared_memory(self, name)
+
+    @classmethod
+    def from_buffer(cls, config, buffer):
+        """Builds a game state from a snapshot made by to_bytes
+
+        The snapshot is read straight from the buffer, without copying it first, so it can be
+        loaded from shared memory or a memoryview. GameUnits are only created when a tile is
+        first accessed, the same as when parsing a game state from the game. Its serialized_string
+        is None, since the snapshot does not keep the string the game sent.
+
+        Args:
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+            * buffer: bytes, a bytearray, a memoryview or any other object supporting the buffer protocol,
+              such as SharedMemory.buf
+
+        Returns:
+            A new game state equal to the one the snapshot was made from
+
+        """
+        return snapshot.from_buffer(config, buffer, cls)
+
     def suppress_warnings(self, suppress):
         """Suppress all warnings
 
@@ -0,0 +1,171 @@
+import math
+import sys
+
+"""
+Static tables describing the shape of the arena. None of them depend on the
+game state, so they are built once when the module is imported and shared by
+every GameMap and path finder.
+
+Tiles are identified by a flat index, x * ARENA_SIZE + y.
+"""
+
+ARENA_SIZE = 28
+HALF_ARENA = 14
+TILE_COUNT = ARENA_SIZE * ARENA_SIZE
+
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+
+def in_bounds(x, y):
+    """Checks if the given coordinates are inside the diamond shaped game board.
+
+    This is the arithmetic version of the check, used to build the tables below and for
+    coordinates that are not integers.
+
+    Args:
+        * x: The x coordinate
+        * y: The y coordinate
+
+    Returns:
+        True if the location is on the board, False otherwise
+
+    """
+    row_size = y + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    top_half_check = (y < HALF_ARENA and x >= startx and x <= endx)
+
+    row_size = (ARENA_SIZE - 1 - y) + 1
+    startx = HALF_ARENA - row_size
+    endx = startx + (2 * row_size) - 1
+    bottom_half_check = (y >= HALF_ARENA and x >= startx and x <= endx)
+
+    return bottom_half_check or top_half_check
+
+
+def tile_index(x, y):
+    """The flat index of an in bounds tile, or -1 if the coordinates are not on the board
+    """
+    if 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and IN_BOUNDS[x * ARENA_SIZE + y]:
+        return x * ARENA_SIZE + y
+    return -1
+
+
+def _build_edges():
+    """The locations of each edge, in the same order GameMap.get_edges has always returned them
+    """
+    top_right = tuple((HALF_ARENA + num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    top_left = tuple((HALF_ARENA - 1 - num, ARENA_SIZE - 1 - num) for num in range(HALF_ARENA))
+    bottom_left = tuple((HALF_ARENA - 1 - num, num) for num in range(HALF_ARENA))
+    bottom_right = tuple((HALF_ARENA + num, num) for num in range(HALF_ARENA))
+    return (top_right, top_left, bottom_left, bottom_right)
+
+
+def _build_neighbors():
+    """For every tile, the in bounds neighbors in the order up, down, right, left
+    """
+    neighbors = []
+    for index in range(TILE_COUNT):
+        x, y = divmod(index, ARENA_SIZE)
+        adjacent = []
+        for nx, ny in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and IN_BOUNDS[nx * ARENA_SIZE + ny]:
+                adjacent.append(nx * ARENA_SIZE + ny)
+        neighbors.append(tuple(adjacent))
+    return tuple(neighbors)
+
+
+def direction_of_edge(end_points):
+    """A direction (x, y) pointing towards the edge the end points lie on. For example, (1, 1) for the top right
+    """
+    x, y = end_points[0]
+    return (-1 if x < HALF_ARENA else 1, -1 if y < HALF_ARENA else 1)
+
+
+def _build_idealness(direction):
+    """Idealness of every tile for a unit heading towards the given direction. Higher is better
+    """
+    table = []
+    for index in range(TILE_COUNT):
+        x, y = divmod(index, ARENA_SIZE)
+        idealness = 28 * y if direction[1] == 1 else 28 * (27 - y)
+        idealness += x if direction[0] == 1 else 27 - x
+        table.append(idealness)
+    return table
+
+
+def _build_edge_idealness(edge):
+    """Idealness of every tile for a unit targeting an edge. The tiles of the edge itself are perfectly ideal
+    """
+    table = list(IDEALNESS[direction_of_edge(EDGE_LOCATIONS[edge])])
+    for index in EDGE_INDICES[edge]:
+        table[index] = sys.maxsize
+    return table
+
+
+IN_BOUNDS = bytearray(1 if in_bounds(x, y) else 0 for x in range(ARENA_SIZE) for y in range(ARENA_SIZE))
+# Ordered by row then column, the order GameMap iterates over the board
+ARENA_TILES = tuple(x * ARENA_SIZE + y for y in range(ARENA_SIZE) for x in range(ARENA_SIZE) if IN_BOUNDS[x * ARENA_SIZE + y])
+NEIGHBORS = _build_neighbors()
+
+EDGE_LOCATIONS = _build_edges()
+EDGE_INDICES = tuple(tuple(x * ARENA_SIZE + y for x, y in edge) for edge in EDGE_LOCATIONS)
+EDGE_SETS = tuple(frozenset(edge) for edge in EDGE_INDICES)
+# The edge each tile belongs to, -1 for tiles that are not on an edge
+EDGE_OF = [-1] * TILE_COUNT
+for _edge, _indices in enumerate(EDGE_INDICES):
+    for _index in _indices:
+        EDGE_OF[_index] = _edge
+del _edge, _indices, _index
+
+IDEALNESS = {direction: _build_idealness(direction) for direction in ((1, 1), (-1, 1), (-1, -1), (1, -1))}
+EDGE_IDEALNESS = tuple(_build_edge_idealness(edge) for edge in range(4))
+
+# The distance between two tiles, indexed by dx * dx + dy * dy
+DISTANCES = tuple(math.sqrt(squared) for squared in range(2 * (ARENA_SIZE - 1) ** 2 + 1))
+
+_stencils = {}
+_tiles_in_range = {}
+
+
+def range_stencil(radius):
+    """The offsets (dx, dy) of every tile within range of a tile, ordered by dx then dy
+
+    A unit with a given range affects all locations whose centers are within that range + 0.51.
+    """
+    stencil = _stencils.get(radius)
+    if stencil is None:
+        reach = int(radius + 1.51)
+        stencil = tuple((dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)
+                        if math.sqrt(dx * dx + dy * dy) < radius + 0.51)
+        _stencils[radius] = stencil
+    return stencil
+
+
+def locations_in_range(x, y, radius):
+    """The in bounds locations within range of an in bounds tile, as (x, y) tuples
+
+    Results are cached per tile and radius. The search window matches GameMap.get_locations_in_range,
+    so the same locations are returned in the same order.
+
+    Args:
+        * x: The x coordinate of the center tile
+        * y: The y coordinate of the center tile
+        * radius: The radius of the search area
+
+    Returns:
+        A tuple of (x, y) locations
+
+    """
+    key = (x, y, radius)
+    locations = _tiles_in_range.get(key)
+    if locations is None:
+        low_x, high_x = int(x - radius), int(x + radius + 1)
+        low_y, high_y = int(y - radius), int(y + radius + 1)
+        locations = tuple((x + dx, y + dy) for dx, dy in range_stencil(radius)
+                          if low_x <= x + dx < high_x and low_y <= y + dy < high_y and not tile_index(x + dx, y + dy) == -1)
+        _tiles_in_range[key] = locations
+    return locations
@@ -1,24 +1,66 @@
-import heapq
-import math
 import sys
-import queue
+import warnings
 from .util import debug_write
+from .geometry import ARENA_SIZE, TILE_COUNT, ARENA_TILES, NEIGHBORS, IDEALNESS, EDGE_INDICES, EDGE_IDEALNESS, tile_index, direction_of_edge
 
-class Node:
-    """A pathfinding node
+"""
+Pathfinding works on flat arrays indexed by x * ARENA_SIZE + y rather than on
+a grid of node objects, using the static tables from the geometry module.
+"""
+
+
+class PathCache:
+    """Remembers the paths returned by GameState.find_path_to_edge
+
+    Paths are keyed by the blocker hash of the game map, the start location and the target edge.
+    Adding or removing a firewall changes the blocker hash, so stale paths are never returned.
+    Paths are stored as tuples and copied on the way out so callers are free to modify them.
 
     Attributes:
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a firewall at this node's location
-        * pathlength: The distance between this node and the target location
+        * max_size (int): The number of paths kept before the cache is emptied
+        * hits (int): The number of lookups that found a cached path
+        * misses (int): The number of lookups that had to compute a path
 
     """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+    def __init__(self, max_size=8192):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._paths = {}
+
+    def __len__(self):
+        return len(self._paths)
+
+    def get(self, key):
+        """Looks up a path
+
+        Args:
+            * key: A (blocker hash, x, y, target edge) tuple
+
+        Returns:
+            A copy of the cached path, or None if the path is not cached
+
+        """
+        path = self._paths.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [list(location) for location in path]
+
+    def put(self, key, path):
+        """Stores a path under the given key
+        """
+        if len(self._paths) >= self.max_size:
+            self._paths.clear()
+        self._paths[key] = tuple(tuple(location) for location in path)
+
+    def clear(self):
+        """Removes all cached paths and resets the hit and miss counters
+        """
+        self._paths.clear()
+        self.hits = 0
+        self.misses = 0
 
 """
 This class helps with pathfinding. We guarentee the results will
@@ -28,17 +70,33 @@ code to maximise time efficiancy
 class ShortestPathFinder:
     """Handles pathfinding
 
+    The search state lives in preallocated flat arrays that are reused between calls. Instead of
+    clearing the visited arrays, every search bumps a stamp and a tile counts as visited when it
+    holds the current stamp.
+
     Attributes:
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
 
     """
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
+        self.game_state = None
+        self._blocked = bytearray(TILE_COUNT)
+        self._pathlength = [-1] * TILE_COUNT
+        self._visited_idealness = [0] * TILE_COUNT
+        self._visited_validate = [0] * TILE_COUNT
+        self._queue = [0] * TILE_COUNT
+        self._pocket_ideal = [0] * TILE_COUNT
+        self._searched_count = 0
+        self._stamp = 0
+        self._end_indices = ()
+        self._end_set = frozenset()
+        self._direction = (1, 1)
+        self._idealness = IDEALNESS[self._direction]
 
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds tha path a unit would take to reach a set of endpoints
@@ -56,226 +114,229 @@ class ShortestPathFinder:
         if game_state.contains_stationary_unit(start_point):
             return
 
-        #Initialize map 
-        self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
-        #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self._prepare(end_points, game_state)
+        start = start_point[0] * ARENA_SIZE + start_point[1]
         #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
+        ideal_tile = self._idealness_search(start)
+        self._validate(ideal_tile)
+        return self._get_path(start_point)
 
-    def _idealness_search(self, start, end_points):
-        """
-        Finds the most ideal tile in our 'pocket' of pathable space. 
-        The edge if it is available, or the best self destruct location otherwise
-        """
-        current = queue.Queue()
-        current.put(start)
-        best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
-        most_ideal = start
+    def navigate_from_multiple_starts(self, start_points, end_points, game_state):
+        """Finds the paths units at several start points would take to reach the same set of endpoints
 
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
-                    continue
+        Every start in the same pocket of pathable space shares its most ideal tile, so the idealness
+        search and the validation run once per pocket rather than once per start point.
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
-
-                if current_idealness > best_idealness:
-                    best_idealness = current_idealness
-                    most_ideal = neighbor
-
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+        Args:
+            * start_points: A list of starting locations
+            * end_points: The end points of the units, should be a list of edge locations
+            * game_state: The current game state
 
-        return most_ideal
+        Returns:
+            A list with the path for each start point, in the same order as start_points.
+            The entry is None for start points holding a stationary unit.
 
-    def _get_neighbors(self, location):
-        """Get the locations adjacent to a location
         """
-        x, y = location
-        return [[x, y + 1], [x, y - 1], [x + 1, y], [x - 1, y]]
-
-    def _get_direction_from_endpoints(self, end_points):
-        """Prints a message to the games debug output
-
-        Args:
-            * end_points: A set of endpoints, should be an edge 
+        self._prepare(end_points, game_state)
+        blocked = self._blocked
+        searched = self._visited_idealness
+        validated = self._visited_validate
+        pocket_ideal = self._pocket_ideal
+        stamp = self._stamp
+
+        paths = []
+        for start_point in start_points:
+            start = start_point[0] * ARENA_SIZE + start_point[1]
+            if blocked[start]:
+                paths.append(None)
+                continue
+            if not searched[start] == stamp:
+                ideal_tile = self._idealness_search(start)
+                #The queue still holds every tile of the pocket we just searched
+                for index in self._queue[:self._searched_count]:
+                    pocket_ideal[index] = ideal_tile
+            ideal_tile = pocket_ideal[start]
+            if not validated[ideal_tile] == stamp:
+                self._validate(ideal_tile)
+            paths.append(self._get_path(start_point))
+        return paths
+
+    def _prepare(self, end_points, game_state):
+        """Starts a new search over the given game state
+        """
+        self.game_state = game_state
+        self._stamp += 1
+        self._fill_blocked(game_state)
+        self._set_end_points(end_points)
 
-        Returns:
-            A direction [x,y] representing the edge. For example, [1,1] for the top right and [-1, 1] for the top left
+    def _fill_blocked(self, game_state):
+        """Marks every tile holding a stationary unit as blocked
+        """
+        blocked = self._blocked
+        blocked[:] = bytes(TILE_COUNT)
+        for x, y in game_state.game_map.iter_stationary():
+            blocked[x * ARENA_SIZE + y] = 1
 
+    def _set_end_points(self, end_points):
+        """Converts the end points to tile indices and looks up the idealness of every tile for them
         """
-        point = end_points[0]
-        x, y = point
-        direction = [1, 1]
-        if x < self.game_state.HALF_ARENA:
-           direction[0] = -1
-        if y < self.game_state.HALF_ARENA:
-            direction[1] = -1
-        return direction
-
-    def _get_idealness(self, location, end_points):
-        """Get the idealness of a tile, the reachable tile the unit most wants to path to.
-        Better self destruct locations are more ideal. The endpoints are perfectly ideal. 
+        self._end_indices = tuple(index for index in (tile_index(x, y) for x, y in end_points) if not index == -1)
+        self._end_set = frozenset(self._end_indices)
+        self._direction = direction_of_edge(end_points)
+        if self._end_indices in EDGE_INDICES:
+            self._idealness = EDGE_IDEALNESS[EDGE_INDICES.index(self._end_indices)]
+        else:
+            self._idealness = list(IDEALNESS[self._direction])
+            for index in self._end_indices:
+                self._idealness[index] = sys.maxsize
 
-        Returns:
-            A location the unit will attempt to reach
+    def _idealness_search(self, start):
+        """
+        Finds the most ideal tile in our 'pocket' of pathable space.
+        The edge if it is available, or the best self destruct location otherwise
         """
-        if location in end_points:
-            return sys.maxsize
+        stamp = self._stamp
+        blocked = self._blocked
+        visited = self._visited_idealness
+        idealness = self._idealness
+        queue = self._queue
+
+        queue[0] = start
+        head, tail = 0, 1
+        visited[start] = stamp
+        best_idealness = idealness[start]
+        most_ideal = start
+
+        while head < tail:
+            search_location = queue[head]
+            head += 1
+            for neighbor in NEIGHBORS[search_location]:
+                if blocked[neighbor] or visited[neighbor] == stamp:
+                    continue
+                visited[neighbor] = stamp
 
-        direction = self._get_direction_from_endpoints(end_points)
+                current_idealness = idealness[neighbor]
+                if current_idealness > best_idealness:
+                    best_idealness = current_idealness
+                    most_ideal = neighbor
 
-        idealness = 0
-        if direction[1] == 1:
-            idealness += 28 * location[1]
-        else: 
-            idealness += 28 * (27 - location[1])
-        if direction[0] == 1:
-            idealness += location[0]
-        else: 
-            idealness += (27 - location[0])
+                queue[tail] = neighbor
+                tail += 1
 
-        return idealness
+        self._searched_count = tail
+        return most_ideal
 
-    def _validate(self, ideal_tile, end_points):
+    def _validate(self, ideal_tile):
         """Breadth first search of the grid, setting the pathlengths of each node
 
         """
-        #VALDIATION
-        #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
-               #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
-        else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
-
-        #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        stamp = self._stamp
+        blocked = self._blocked
+        visited = self._visited_validate
+        pathlength = self._pathlength
+        queue = self._queue
+
+        #Add our most ideal tiles to the queue
+        seeds = self._end_indices if ideal_tile in self._end_set else (ideal_tile,)
+        tail = 0
+        for location in seeds:
+            if visited[location] == stamp:
+                continue
+            pathlength[location] = 0
+            visited[location] = stamp
+            queue[tail] = location
+            tail += 1
+
+        head = 0
+        while head < tail:
+            current_location = queue[head]
+            head += 1
+            if blocked[current_location]:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in NEIGHBORS[current_location]:
+                if blocked[neighbor] or visited[neighbor] == stamp:
                     continue
+                pathlength[neighbor] = next_pathlength
+                visited[neighbor] = stamp
+                queue[tail] = neighbor
+                tail += 1
 
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
-
-        #debug_write("Print after validate")
-        #self.print_map()
-        return
+    def _get_pathlength(self, index):
+        """The pathlength found for a tile during the last validation, -1 if it was not reached
+        """
+        return self._pathlength[index] if self._visited_validate[index] == self._stamp else -1
 
-    def _get_path(self, start_point, end_points):
+    def _get_path(self, start_point):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
-        #GET THE PATH
         path = [start_point]
-        current = start_point
+        current = start_point[0] * ARENA_SIZE + start_point[1]
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not self._get_pathlength(current) == 0:
+            next_move = self._choose_next_move(current, move_direction)
 
-            if current[0] == next_move[0]:
+            if current // ARENA_SIZE == next_move // ARENA_SIZE:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            path.append(list(divmod(next_move, ARENA_SIZE)))
             current = next_move
-        
-        #debug_write(path)
+
         return path
-  
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
+
+    def _choose_next_move(self, current_point, previous_move_direction):
         """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
-
+        blocked = self._blocked
         ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        best_pathlength = self._get_pathlength(current_point)
+        for neighbor in NEIGHBORS[current_point]:
+            if blocked[neighbor]:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = self._get_pathlength(neighbor)
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if current_pathlength == best_pathlength and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction):
                 continue
 
             ideal_neighbor = neighbor
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction):
         """Compare two tiles and return True if the unit would rather move to the new one
 
+        All three tiles are flat tile indices.
         """
+        prev_x, prev_y = divmod(prev_tile, ARENA_SIZE)
+        new_x, new_y = divmod(new_tile, ARENA_SIZE)
+        best_x, best_y = divmod(prev_best, ARENA_SIZE)
+
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
-            return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
-                return False
-            return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
-                return False
-            return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
-                return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
-                return True
-            return False
+            return not prev_y == new_y
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            return not prev_x == new_x
+        if previous_move_direction == 0:
+            return not prev_y == new_y
+
+        #To make it here, both moves are on the same axis
+        direction = self._direction
+        if new_y == best_y: #If they both moved horizontal...
+            #Prefer the move towards the target edge
+            return (direction[0] == 1 and new_x > best_x) or (direction[0] == -1 and new_x < best_x)
+        if new_x == best_x: #If they both moved vertical...
+            return (direction[1] == 1 and new_y > best_y) or (direction[1] == -1 and new_y < best_y)
         return True
 
     def print_map(self):
@@ -284,9 +345,10 @@ class ShortestPathFinder:
         """
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                index = x * ARENA_SIZE + 28 - y - 1
+                pathlength = self._get_pathlength(index)
+                if not self._blocked[index] and not pathlength == -1:
+                    self._print_justified(pathlength)
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -299,3 +361,270 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class DynamicPathField(ShortestPathFinder):
+    """A distance field towards one set of endpoints that can be patched one tile at a time
+
+    The field keeps its own copy of the blocked tiles, taken from the game state when it is created.
+    It does not watch the game map, instead block and unblock are used to try out hypothetical firewalls.
+    Each call only repairs the part of the distance field whose pathlengths actually change.
+    When a change alters the pockets of pathable space or the most ideal tile of a pocket,
+    the whole field is recomputed. Paths match the ones navigate_multiple_endpoints returns for the same board.
+
+    Attributes:
+        * rebuilds (int): The number of times the whole field had to be recomputed
+
+    """
+    def __init__(self, game_state, end_points):
+        """Builds the field for the current game state
+
+        Args:
+            * game_state: The game state whose firewalls initially block the field
+            * end_points: The end points of the units, should be a list of edge locations
+
+        """
+        super().__init__()
+        self._pocket = [-1] * TILE_COUNT
+        self._pocket_ideals = []
+        self._pocket_end_counts = []
+        self._affected = [0] * TILE_COUNT
+        self.rebuilds = 0
+        self._prepare(end_points, game_state)
+        self._rebuild()
+
+    def navigate(self, start_point):
+        """Gets the path a unit at start_point would take on the current field
+
+        Args:
+            * start_point: The starting location of the unit
+
+        Returns:
+            The path a unit at start_point would take, or None if start_point is blocked
+
+        """
+        if not self._on_board(start_point) or self._blocked[start_point[0] * ARENA_SIZE + start_point[1]]:
+            return
+        return self._get_path(start_point)
+
+    def pathlength(self, location):
+        """The number of steps between a location and the target of its pocket, -1 if it is blocked
+        """
+        return self._pathlength[location[0] * ARENA_SIZE + location[1]]
+
+    def block(self, location):
+        """Marks a location as holding a firewall and repairs the field
+
+        Args:
+            * location: The location to block
+
+        """
+        if not self._on_board(location):
+            warnings.warn("{} is out of bounds.".format(str(location)))
+            return
+        tile = location[0] * ARENA_SIZE + location[1]
+        if self._blocked[tile]:
+            return
+
+        pocket = self._pocket[tile]
+        old_pathlength = self._pathlength[tile]
+        self._blocked[tile] = 1
+        self._pocket[tile] = -1
+        self._pathlength[tile] = -1
+
+        if tile in self._end_set:
+            self._pocket_end_counts[pocket] -= 1
+            if self._pocket_end_counts[pocket] == 0:
+                self._rebuild()
+                return
+        elif tile == self._pocket_ideals[pocket] and not self._pocket_end_counts[pocket]:
+            self._rebuild()
+            return
+        if self._may_split(tile):
+            self._rebuild()
+            return
+        self._repair_blocked(tile, old_pathlength)
+
+    def unblock(self, location):
+        """Removes the firewall at a location and repairs the field
+
+        Args:
+            * location: The location to unblock
+
+        """
+        if not self._on_board(location):
+            warnings.warn("{} is out of bounds.".format(str(location)))
+            return
+        tile = location[0] * ARENA_SIZE + location[1]
+        if not self._blocked[tile]:
+            return
+        self._blocked[tile] = 0
+
+        pathlength = self._pathlength
+        pockets = set(self._pocket[neighbor] for neighbor in NEIGHBORS[tile] if not self._blocked[neighbor])
+        is_end = tile in self._end_set
+        if not pockets:
+            #A new pocket holding only this tile, which is its own most ideal tile
+            self._pocket[tile] = len(self._pocket_ideals)
+            self._pocket_ideals.append(tile)
+            self._pocket_end_counts.append(1 if is_end else 0)
+            pathlength[tile] = 0
+            return
+        if len(pockets) > 1:
+            self._rebuild()
+            return
+
+        pocket = pockets.pop()
+        if self._pocket_end_counts[pocket]:
+            if is_end:
+                self._pocket_end_counts[pocket] += 1
+        elif is_end or self._idealness[tile] > self._idealness[self._pocket_ideals[pocket]]:
+            self._rebuild()
+            return
+
+        self._pocket[tile] = pocket
+        if is_end:
+            pathlength[tile] = 0
+        else:
+            pathlength[tile] = min(pathlength[neighbor] for neighbor in NEIGHBORS[tile] if not self._blocked[neighbor]) + 1
+        #Spread the shorter pathlengths through the pocket
+        queue = [tile]
+        for current in queue:
+            next_pathlength = pathlength[current] + 1
+            for neighbor in NEIGHBORS[current]:
+                if not self._blocked[neighbor] and pathlength[neighbor] > next_pathlength:
+                    pathlength[neighbor] = next_pathlength
+                    queue.append(neighbor)
+
+    def _get_pathlength(self, index):
+        return self._pathlength[index]
+
+    def _on_board(self, location):
+        x, y = location
+        return not tile_index(x, y) == -1
+
+    def _rebuild(self):
+        """Recomputes the pockets, their most ideal tiles and the whole distance field
+        """
+        self.rebuilds += 1
+        blocked = self._blocked
+        pocket = self._pocket
+        pathlength = self._pathlength
+        end_set = self._end_set
+        idealness = self._idealness
+        for index in range(TILE_COUNT):
+            pocket[index] = -1
+            pathlength[index] = -1
+        self._pocket_ideals = []
+        self._pocket_end_counts = []
+
+        sources = [index for index in self._end_indices if not blocked[index]]
+        for start in ARENA_TILES:
+            if blocked[start] or not pocket[start] == -1:
+                continue
+            pocket_id = len(self._pocket_ideals)
+            pocket[start] = pocket_id
+            queue = [start]
+            for current in queue:
+                for neighbor in NEIGHBORS[current]:
+                    if not blocked[neighbor] and pocket[neighbor] == -1:
+                        pocket[neighbor] = pocket_id
+                        queue.append(neighbor)
+            end_count = sum(1 for index in queue if index in end_set)
+            most_ideal = max(queue, key=idealness.__getitem__)
+            self._pocket_ideals.append(most_ideal)
+            self._pocket_end_counts.append(end_count)
+            if not end_count:
+                sources.append(most_ideal)
+
+        #Pockets never overlap, so one search from every pocket's target fills in the whole field
+        for index in sources:
+            pathlength[index] = 0
+        queue = sources
+        for current in queue:
+            next_pathlength = pathlength[current] + 1
+            for neighbor in NEIGHBORS[current]:
+                if not blocked[neighbor] and pathlength[neighbor] == -1:
+                    pathlength[neighbor] = next_pathlength
+                    queue.append(neighbor)
+
+    def _may_split(self, tile):
+        """Checks if blocking a tile could split its pocket in two
+
+        Walks the eight tiles surrounding the blocked tile. If all of its open neighbors are
+        joined through that ring, the pocket is still connected. Otherwise it might not be.
+        """
+        x, y = divmod(tile, ARENA_SIZE)
+        ring = ((x, y + 1), (x + 1, y + 1), (x + 1, y), (x + 1, y - 1), (x, y - 1), (x - 1, y - 1), (x - 1, y), (x - 1, y + 1))
+        open_ring = [self._on_board(location) and not self._blocked[location[0] * ARENA_SIZE + location[1]] for location in ring]
+        if all(open_ring):
+            return False
+
+        #Start just after a closed tile so no run of open tiles wraps around the end of the ring
+        first = open_ring.index(False)
+        runs = 0
+        in_run = False
+        joins_neighbor = False
+        for step in range(1, 9):
+            position = (first + step) % 8
+            if open_ring[position]:
+                in_run = True
+                joins_neighbor = joins_neighbor or position % 2 == 0
+            elif in_run:
+                runs += 1 if joins_neighbor else 0
+                in_run = False
+                joins_neighbor = False
+        return runs > 1
+
+    def _repair_blocked(self, tile, old_pathlength):
+        """Fixes the pathlengths that depended on a tile that was just blocked
+        """
+        blocked = self._blocked
+        pathlength = self._pathlength
+        affected = self._affected
+        self._stamp += 1
+        stamp = self._stamp
+
+        #Find every tile that lost all of its neighbors one step closer to the target
+        candidates = [neighbor for neighbor in NEIGHBORS[tile] if not blocked[neighbor] and pathlength[neighbor] == old_pathlength + 1]
+        lost = []
+        for current in candidates:
+            if affected[current] == stamp:
+                continue
+            current_pathlength = pathlength[current]
+            supported = False
+            for neighbor in NEIGHBORS[current]:
+                if not blocked[neighbor] and not affected[neighbor] == stamp and pathlength[neighbor] == current_pathlength - 1:
+                    supported = True
+                    break
+            if supported:
+                continue
+            affected[current] = stamp
+            lost.append(current)
+            for neighbor in NEIGHBORS[current]:
+                if not blocked[neighbor] and pathlength[neighbor] == current_pathlength + 1:
+                    candidates.append(neighbor)
+        if not lost:
+            return
+
+        #Settle the lost tiles again, starting from the unaffected tiles around them
+        buckets = {}
+        for current in lost:
+            best = -1
+            for neighbor in NEIGHBORS[current]:
+                if not blocked[neighbor] and not affected[neighbor] == stamp and (best == -1 or pathlength[neighbor] < best):
+                    best = pathlength[neighbor]
+            pathlength[current] = -1
+            if not best == -1:
+                buckets.setdefault(best + 1, []).append(current)
+
+        level = min(buckets)
+        while buckets:
+            for current in buckets.pop(level, ()):
+                if not pathlength[current] == -1:
+                    continue
+                pathlength[current] = level
+                for neighbor in NEIGHBORS[current]:
+                    if affected[neighbor] == stamp and pathlength[neighbor] == -1:
+                        buckets.setdefault(level + 1, []).append(neighbor)
+            level += 1
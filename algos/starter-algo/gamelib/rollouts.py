@@ -0,0 +1,208 @@
+import multiprocessing
+import random
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+from .game_config import compile_config, BITS
+from .game_state import GameState
+from .simulation import ActionSimulator
+
+"""
+Evaluating deploy candidates on every core. A pool of worker processes is started once per game.
+Each evaluation puts the board in shared memory as a snapshot, see GameState.to_shared_memory,
+and only the name of the block is sent with each task. Every worker loads the board once, and
+every candidate is played out against a number of random enemy deploys with the ActionSimulator.
+"""
+
+"""
+The averaged outcome of the rollouts of one deploy candidate. A candidate is a
+(unit_type, location, count) tuple. Damage dealt and taken is to the players' health,
+firewall damage is the damage your units dealt to enemy firewalls and units lost counts your
+information units. The score is damage dealt minus damage taken.
+"""
+RolloutStats = namedtuple("RolloutStats", ["candidate", "rollouts", "damage_dealt", "damage_taken", "firewall_damage", "units_lost", "score"])
+
+# Set in each worker process by _init_worker
+_worker_config = None
+_worker_board = (None, None)
+
+
+def deploy_candidates(game_state, unit_types, counts=(1,)):
+    """Lists the deploys deploy_attackers in the starter strategy chooses from at random
+
+    Args:
+        * game_state: The current game state
+        * unit_types: The information unit types to try
+        * counts: The numbers of units to try at each location. Counts you can not afford are left out
+
+    Returns:
+        A list of (unit_type, location, count) candidates, one for each free location on your edges
+
+    """
+    game_map = game_state.game_map
+    edges = game_map.get_edge_locations(game_map.BOTTOM_LEFT) + game_map.get_edge_locations(game_map.BOTTOM_RIGHT)
+    locations = [location for location in edges if not game_state.contains_stationary_unit(location)]
+    candidates = []
+    for unit_type in unit_types:
+        affordable = game_state.number_affordable(unit_type)
+        for count in counts:
+            if count > affordable:
+                continue
+            for location in locations:
+                candidates.append((unit_type, location, count))
+    return candidates
+
+
+def random_enemy_deploy(game_state, rng):
+    """A random enemy attack: all of the enemy's bits spent on one information unit type at one edge location
+
+    Args:
+        * game_state: The current game state
+        * rng: A random.Random used to choose
+
+    Returns:
+        A list of (unit_type, x, y) tuples, one per unit, empty if the enemy can not afford anything
+
+    """
+    game_map = game_state.game_map
+    game_config = game_state.game_config
+    bits = game_state.get_resource(BITS, 1)
+    unit_types = sorted(unit_type for unit_type in game_config.INFORMATION_TYPES if game_state.type_cost(unit_type) <= bits)
+    edges = game_map.get_edge_locations(game_map.TOP_LEFT) + game_map.get_edge_locations(game_map.TOP_RIGHT)
+    locations = [location for location in edges if not game_state.contains_stationary_unit(location)]
+    if not unit_types or not locations:
+        return []
+    unit_type = rng.choice(unit_types)
+    x, y = rng.choice(locations)
+    return [(unit_type, x, y)] * int(bits // game_state.type_cost(unit_type))
+
+
+def _init_worker(config):
+    global _worker_config
+    _worker_config = compile_config(config)
+
+
+def _attach(block_name):
+    """Opens a block of shared memory made by the main process, without this worker taking ownership of it
+    """
+    try:
+        return shared_memory.SharedMemory(name=block_name, track=False)
+    except TypeError:
+        # Before Python 3.13, attaching registers the block with this worker's resource tracker,
+        # which would unlink it again at shutdown and warn about a leak
+        block = shared_memory.SharedMemory(name=block_name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def _run_rollouts(task):
+    """Evaluates one candidate in a worker process
+    """
+    global _worker_board
+    block_name, candidate, rollouts, seed = task
+    if _worker_board[0] != block_name:
+        # Every evaluation gets a new block, so its name identifies the board
+        block = _attach(block_name)
+        try:
+            game_state = GameState.from_buffer(_worker_config, block.buf)
+        finally:
+            block.close()
+        _worker_board = (block_name, ActionSimulator(game_state))
+    simulator = _worker_board[1]
+    game_state = simulator.game_state
+    unit_type, (x, y), count = candidate
+    deploys = [(unit_type, x, y)] * count
+    rng = random.Random(seed)
+    totals = [0, 0, 0, 0]
+    for _ in range(rollouts):
+        result = simulator.simulate(deploys, random_enemy_deploy(game_state, rng))
+        totals[0] += result.damage_dealt[0]
+        totals[1] += result.damage_dealt[1]
+        totals[2] += result.firewall_damage[0]
+        totals[3] += result.units_lost[0]
+    dealt, taken, firewall_damage, units_lost = (total / rollouts for total in totals)
+    return RolloutStats(candidate, rollouts, dealt, taken, firewall_damage, units_lost, dealt - taken)
+
+
+class RolloutPool:
+    """A pool of worker processes that play deploy candidates out against random enemy deploys
+
+    Start it once, in on_game_start, since starting processes takes far longer than a turn should.
+    Workers never write to stdout, which is reserved for talking to the game.
+
+    Attributes:
+        * game_config (:obj: GameConfig): The compiled config the workers use
+        * rollouts (int): The default number of enemy deploys each candidate is played against
+        * processes (int): The number of worker processes
+
+    """
+    def __init__(self, config, processes=None, rollouts=8, seed=None):
+        """Starts the worker processes
+
+        Args:
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+            * processes: The number of worker processes. One per core if None
+            * rollouts: The default number of enemy deploys each candidate is played against
+            * seed: Seeds the random enemy deploys, so evaluations can be repeated. Random if None
+
+        """
+        self.game_config = compile_config(config)
+        self.rollouts = rollouts
+        self.processes = processes or multiprocessing.cpu_count()
+        self._seed = random.Random(seed)
+        self.__start()
+
+    def __start(self):
+        self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self.game_config.config,))
+
+    def evaluate(self, game_state, candidates, rollouts=None, timeout=None):
+        """Plays every candidate out against random enemy deploys, spread over the worker processes
+
+        The enemy deploys come from random_enemy_deploy. Every candidate is played against its own
+        enemy deploys, so scores are noisy for small numbers of rollouts.
+
+        Args:
+            * game_state: The game state to evaluate, with the firewalls of this turn already spawned
+            * candidates: A list of (unit_type, location, count) tuples, see deploy_candidates
+            * rollouts: The number of enemy deploys each candidate is played against. self.rollouts if None
+            * timeout: Seconds to wait for the results before raising multiprocessing.TimeoutError. No limit if None.
+              On a timeout the worker processes are restarted, so unfinished work does not hold up later calls
+
+        Returns:
+            A list with the RolloutStats of each candidate, in the same order as the candidates
+
+        """
+        if not candidates:
+            return []
+        block = game_state.to_shared_memory()
+        rollouts = rollouts or self.rollouts
+        tasks = [(block.name, candidate, rollouts, self._seed.getrandbits(32)) for candidate in candidates]
+        chunk_size = max(1, len(tasks) // (self.processes * 4))
+        try:
+            return self._pool.map_async(_run_rollouts, tasks, chunk_size).get(timeout)
+        except multiprocessing.TimeoutError:
+            # The workers would carry on with the tasks still queued, ahead of the next call's
+            self.close()
+            self.__start()
+            raise
+        finally:
+            block.close()
+            block.unlink()
+
+    def best(self, game_state, candidates, rollouts=None, timeout=None):
+        """The RolloutStats of the highest scoring candidate, see evaluate. None if there are no candidates
+        """
+        results = self.evaluate(game_state, candidates, rollouts, timeout)
+        return max(results, key=lambda stats: stats.score) if results else None
+
+    def close(self):
+        """Stops the worker processes
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
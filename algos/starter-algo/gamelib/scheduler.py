@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+from .game_config import compile_config
+from .util import debug_write, send_command
+
+"""
+Spending as much of the turn time as is safe. Strategies register work units that improve
+a plan a little at a time, and the scheduler keeps running them until the deadline gets close,
+then submits the best plan found. A watchdog timer submits the best plan on time even if a
+work unit is still running.
+"""
+
+"""
+Timing of one finished turn: the time budget, the time taken until the last work step finished,
+the number of work steps run, the longest step, and whether the watchdog had to submit the plan.
+When the watchdog submits, the elapsed time is still measured to the end of the overrunning step.
+"""
+TurnTiming = namedtuple("TurnTiming", ["budget", "elapsed", "steps", "longest_step", "watchdog"])
+
+
+class TurnScheduler:
+    """Runs iterative deepening work units against a deadline and submits the best plan in time
+
+    A plan is a GameState, usually a fork, with the spawns it wants queued. Work units are
+    functions called as work(depth) with depth 1, 2, 3 and so on. Each call returns a
+    (score, plan) tuple, or None once the work unit has nothing more to add. The plan with the
+    highest score is submitted. Plans must not be changed after they are returned or offered.
+
+    A step is only started if the last step of the same work unit, times growth, still fits before
+    the deadline. Steps can not be interrupted, so the watchdog submits the best plan at the deadline
+    if a step overruns. The budget shrinks by the largest overrun among the turns in history.
+
+    Attributes:
+        * soft_limit (float): Seconds a turn may take before the algo is penalized
+        * budget_fraction (float): The share of the soft limit the scheduler plans to use
+        * safety_margin (float): Seconds kept in reserve below the budget
+        * growth (float): How much longer each step of a work unit is expected to take than the last one
+        * history (deque): TurnTiming records of recent turns, newest last
+        * deadline (float): The time.monotonic() time by which the current turn is submitted
+        * best_score: The score of the best plan so far this turn
+        * best_plan (:obj: GameState): The best plan so far this turn
+        * submitted (bool): True once the plan of the current turn has been submitted
+
+    """
+    def __init__(self, config, budget_fraction=0.9, safety_margin=0.25, growth=3, history_size=20):
+        """Creates a scheduler using the turn time limits of a config
+
+        Args:
+            * config (JSON): Contains information about the game, or a GameConfig compiled from it
+            * budget_fraction: The share of the soft limit the scheduler plans to use
+            * safety_margin: Seconds kept in reserve below the budget
+            * growth: How much longer each step of a work unit is expected to take than the last one
+            * history_size: The number of turns kept in history
+
+        """
+        game_config = compile_config(config)
+        self.soft_limit = game_config.wait_time_bot_soft
+        if self.soft_limit is None:
+            self.soft_limit = game_config.wait_time_bot_max if game_config.wait_time_bot_max is not None else 5
+        self.budget_fraction = budget_fraction
+        self.safety_margin = safety_margin
+        self.growth = growth
+        self.history = deque(maxlen=history_size)
+        self.deadline = None
+        self.best_score = None
+        self.best_plan = None
+        self.submitted = True
+        self._start_time = None
+        self._work = []
+        self._lock = threading.Lock()
+        self._watchdog = None
+        self._watchdog_fired = False
+
+    def budget(self):
+        """The number of seconds the next turn may use, based on the limits and recent history
+        """
+        overrun = max([timing.elapsed - timing.budget for timing in self.history] + [0])
+        return max(0, self.soft_limit * self.budget_fraction - self.safety_margin - overrun)
+
+    def begin_turn(self, start_time=None):
+        """Starts the clock for a new turn and forgets the plans and work of the last one
+
+        Args:
+            * start_time: The time.monotonic() time the turn state arrived, such as AlgoCore.turn_start_time. Now if None
+
+        """
+        self.__stop_watchdog()
+        self._start_time = time.monotonic() if start_time is None else start_time
+        self.deadline = self._start_time + self.budget()
+        self.best_score = None
+        self.best_plan = None
+        self.submitted = False
+        self._work = []
+        self._watchdog_fired = False
+        self._watchdog = threading.Timer(max(0, self.deadline - time.monotonic()), self.__on_deadline)
+        self._watchdog.daemon = True
+        self._watchdog.start()
+
+    def remaining(self):
+        """Seconds left until the deadline of the current turn
+        """
+        return self.deadline - time.monotonic()
+
+    def add_work(self, work):
+        """Registers a work unit for the current turn
+
+        Args:
+            * work: A function called as work(depth), returning a (score, plan) tuple or None when it is done
+
+        """
+        self._work.append(work)
+
+    def offer(self, score, plan):
+        """Records a plan, keeping it if it scores higher than the best plan so far
+
+        Args:
+            * score: The score of the plan, higher is better
+            * plan: A GameState with the spawns of the plan queued
+
+        Returns:
+            True if the plan is the new best plan
+
+        """
+        with self._lock:
+            if self.submitted or (self.best_score is not None and score <= self.best_score):
+                return False
+            self.best_score = score
+            self.best_plan = plan
+            return True
+
+    def run(self):
+        """Runs the work units, round robin by depth, until they are done or the deadline is close, then submits the best plan
+
+        Returns:
+            The plan that was submitted, None if there was no plan to submit
+
+        """
+        steps = 0
+        longest_step = 0
+        pending = [[work, 1, 0] for work in self._work]
+        while pending and not self.submitted:
+            ran = False
+            for entry in list(pending):
+                work, depth, last_duration = entry
+                if self.submitted:
+                    break
+                if last_duration * self.growth > self.remaining():
+                    pending.remove(entry)
+                    continue
+                step_start = time.monotonic()
+                result = work(depth)
+                duration = time.monotonic() - step_start
+                steps += 1
+                ran = True
+                longest_step = max(longest_step, duration)
+                if result is None:
+                    pending.remove(entry)
+                    continue
+                self.offer(*result)
+                entry[1] = depth + 1
+                entry[2] = duration
+            if not ran:
+                break
+        finish_time = time.monotonic()
+        plan = self.submit()
+        self.history.append(TurnTiming(self.deadline - self._start_time, finish_time - self._start_time,
+                                       steps, longest_step, self._watchdog_fired))
+        return plan
+
+    def submit(self):
+        """Submits the best plan now, unless it has already been submitted this turn
+
+        Returns:
+            The plan that was submitted, None if there was no plan and an empty turn was sent instead
+
+        """
+        self.__stop_watchdog()
+        with self._lock:
+            if self.submitted:
+                return self.best_plan
+            self.submitted = True
+            plan = self.best_plan
+        if plan is None:
+            debug_write("TurnScheduler had no plan to submit, sending an empty turn")
+            send_command("")
+            send_command("")
+        else:
+            plan.submit_turn()
+        return plan
+
+    def __stop_watchdog(self):
+        """Cancels the watchdog of the current turn and waits for it, unless called from the watchdog itself
+        """
+        watchdog = self._watchdog
+        if watchdog is None:
+            return
+        watchdog.cancel()
+        if watchdog is not threading.current_thread():
+            watchdog.join()
+            self._watchdog = None
+
+    def __on_deadline(self):
+        if not self.submitted:
+            self._watchdog_fired = True
+            debug_write("TurnScheduler deadline reached while a work unit was running, submitting the best plan")
+            self.submit()
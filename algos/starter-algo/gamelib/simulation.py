@@ -0,0 +1,486 @@
+import warnings
+
+from . import geometry
+
+"""
+Predicting the action phase. The simulator plays a round out frame by frame on flat lists of
+unit state instead of GameUnits, so a strategy can afford to try many attacks every turn.
+"""
+
+
+class SimulationResult:
+    """What happened in a simulated action phase
+
+    Every list is indexed by player, 0 for you and 1 for the enemy.
+
+    Attributes:
+        * damage_dealt (list): The damage each player's units dealt to the other player's health by reaching its edge
+        * breaches (list): The locations where each player's information units reached their target edge
+        * firewall_damage (list): The damage each player's units dealt to enemy firewalls, by attacking them or self destructing
+        * units_lost (list): The number of each player's information units that were destroyed or self destructed
+        * firewalls_destroyed (list): The locations of each player's firewalls that were destroyed
+        * frames (int): The number of frames the action phase lasted
+
+    """
+    def __init__(self):
+        self.damage_dealt = [0, 0]
+        self.breaches = [[], []]
+        self.firewall_damage = [0, 0]
+        self.units_lost = [0, 0]
+        self.firewalls_destroyed = [[], []]
+        self.frames = 0
+
+    def __repr__(self):
+        return "SimulationResult(damage_dealt={}, units_lost={}, firewalls_destroyed={}, frames={})".format(
+            self.damage_dealt, self.units_lost, self.firewalls_destroyed, self.frames)
+
+
+class ActionSimulator:
+    """Predicts the action phase that follows a turn
+
+    The firewalls are read from the game state once, when the simulator is created, so one
+    simulator can be run with many different deploy stacks. Firewalls queued with attempt_spawn
+    are already on the game map and take part. Information units on the game map are ignored,
+    only the deploy stacks passed to simulate are spawned.
+
+    Each frame, every information unit that is due moves one step along the path find_path_to_edge
+    gives it, encryptors shield the units in their range once each, every unit attacks the target
+    get_target would choose, and destroyed units are removed. Units reaching their target edge
+    score right away. Units that can not go any further self destruct once they have moved far
+    enough, damaging enemy firewalls around them. When a firewall is destroyed and the config
+    has rerouteMidRound set, units pick a new path from where they are on their next step.
+
+    Units deployed together on one location are simulated as a group, since they share a path,
+    shields and targets, and frames without any attacks are skipped up to the next step. A round
+    with a few stacks of units against a few dozen firewalls takes one to a few milliseconds,
+    depending on the machine.
+
+    Attributes:
+        * game_state (:obj: GameState): The game state the simulator was created from
+        * game_config (:obj: GameConfig): The compiled config of the game state
+
+    """
+    def __init__(self, game_state):
+        """Reads the firewalls and the unit stats used by every simulation
+
+        Args:
+            * game_state: The game state to simulate the action phase of
+
+        """
+        self.game_state = game_state
+        game_config = game_state.game_config
+        self.game_config = game_config
+        mechanics = game_config.mechanics
+        self._reroute = mechanics.get("rerouteMidRound", True)
+        self._shield_decay = mechanics.get("shieldDecayPerFrame", 0)
+        self._self_destruct_steps = mechanics.get("stepsRequiredSelfDestruct", 5)
+        self._self_destruct_radius = mechanics.get("selfDestructRadius", 1.5)
+        base_damage = mechanics.get("basePlayerHealthDamage", 1)
+
+        unit_information = {unit["shorthand"]: unit for unit in game_config.config["unitInformation"]}
+        # Per information type: move period, damage to firewalls, damage to information,
+        # squared reach, range, stability, damage to the enemy player and whether it attacks firewalls
+        self._mobile_stats = {}
+        for unit_type in game_config.INFORMATION_TYPES:
+            stats = game_config.unit_stats[unit_type]
+            reach = stats.range + 0.51
+            self._mobile_stats[unit_type] = (max(1, int(round(1 / stats.speed))), stats.damage_f or 0, stats.damage_i or 0,
+                                             reach * reach, stats.range, stats.max_stability,
+                                             unit_information[unit_type].get("damageToPlayer", base_damage),
+                                             unit_type != game_config.SCRAMBLER)
+
+        # Firewall columns, one entry per firewall
+        self._fw_x = []
+        self._fw_y = []
+        self._fw_owner = []
+        self._fw_stability = []
+        self._fw_damage = []
+        self._fw_shield = []
+        self._firewall_at = {}
+        # Per player, tile index -> the enemy firewalls that attack the player's units on that tile, with
+        # their squared distance to the tile, and the friendly firewalls that shield them
+        self._defenders = ({}, {})
+        self._shielders = ({}, {})
+        self._near = {}
+        self._targets_near = {}
+
+        game_map = game_state.game_map
+        for location in game_map.iter_stationary():
+            for unit in game_map[location]:
+                if not unit.stationary:
+                    continue
+                number = len(self._fw_x)
+                info = unit_information[unit.unit_type]
+                self._fw_x.append(unit.x)
+                self._fw_y.append(unit.y)
+                self._fw_owner.append(unit.player_index)
+                self._fw_stability.append(unit.stability)
+                self._fw_damage.append(info.get("damage", 0))
+                self._fw_shield.append(info.get("shieldAmount", 0))
+                self._firewall_at[unit.x * geometry.ARENA_SIZE + unit.y] = number
+                if self._fw_damage[-1] > 0:
+                    defenders = self._defenders[1 - unit.player_index]
+                    for x, y in geometry.locations_in_range(unit.x, unit.y, unit.range):
+                        defenders.setdefault(x * geometry.ARENA_SIZE + y, []).append((number, (x - unit.x) ** 2 + (y - unit.y) ** 2))
+                if self._fw_shield[-1] > 0:
+                    shielders = self._shielders[unit.player_index]
+                    for x, y in geometry.locations_in_range(unit.x, unit.y, unit.range):
+                        shielders.setdefault(x * geometry.ARENA_SIZE + y, []).append(number)
+
+    def __firewalls_near(self, tile, radius):
+        """The firewalls within a radius of a tile, in the order get_locations_in_range visits them
+        """
+        key = (tile, radius)
+        near = self._near.get(key)
+        if near is None:
+            firewall_at = self._firewall_at
+            size = geometry.ARENA_SIZE
+            near = [firewall_at[x * size + y] for x, y in geometry.locations_in_range(tile // size, tile % size, radius)
+                    if x * size + y in firewall_at]
+            self._near[key] = near
+        return near
+
+    def __enemy_firewalls_near(self, tile, radius, player_index):
+        """The enemy firewalls within a radius of a tile as (firewall, squared distance) pairs
+
+        They are ordered by the parts of the targeting priority that never change: distance, y,
+        distance from the center in x and x. Only stability is left to compare while simulating.
+        """
+        key = (tile, radius, player_index)
+        near = self._targets_near.get(key)
+        if near is None:
+            x = tile // geometry.ARENA_SIZE
+            y = tile % geometry.ARENA_SIZE
+            fw_x = self._fw_x
+            fw_y = self._fw_y
+            near = sorted(((f, (fw_x[f] - x) ** 2 + (fw_y[f] - y) ** 2) for f in self.__firewalls_near(tile, radius)
+                           if self._fw_owner[f] != player_index),
+                          key=lambda pair: (pair[1], fw_y[pair[0]], -abs(2 * fw_x[pair[0]] - 27), fw_x[pair[0]]))
+            self._targets_near[key] = near
+        return near
+
+    def simulate(self, my_deploys=None, enemy_deploys=None, max_frames=1000):
+        """Plays out the action phase
+
+        Args:
+            * my_deploys: Your information units as (unit_type, x, y) tuples, one per unit. The deploy stack of the game state if None
+            * enemy_deploys: The enemy's information units as (unit_type, x, y) tuples, one per unit. No enemy units if None
+            * max_frames: Stop after this many frames even if units are still alive
+
+        Returns:
+            A SimulationResult
+
+        """
+        if my_deploys is None:
+            my_deploys = self.game_state._deploy_stack
+        result = SimulationResult()
+        size = geometry.ARENA_SIZE
+        edge_of = geometry.EDGE_OF
+        path_state = self.game_state
+        forked = False
+        layout = 0
+
+        fw_x = self._fw_x
+        fw_y = self._fw_y
+        fw_owner = self._fw_owner
+        fw_damage = self._fw_damage
+        fw_shield = self._fw_shield
+        fw_stability = list(self._fw_stability)
+        defenders = self._defenders
+        shielders = self._shielders
+        shield_decay = self._shield_decay
+
+        # Units deployed together share a player, type and location, so they move, pick up shields and
+        # choose targets together. Those columns have one entry per group of units. Stability and shield
+        # differ between the units of a group and have one entry per unit.
+        stability = []
+        shield = []
+        group_of = []
+        groups = {}
+        owner = []
+        xs = []
+        ys = []
+        tiles = []
+        stats = []
+        paths = []
+        path_step = []
+        path_layout = []
+        moved = []
+        target_edge = []
+        shielded = []
+        shield_tile = []
+        # The enemy firewalls each group could attack from its tile, see __enemy_firewalls_near
+        near = []
+        near_tile = []
+        for player_index, deploys in ((0, my_deploys), (1, enemy_deploys or ())):
+            for unit_type, x, y in deploys:
+                unit_stats = self._mobile_stats.get(unit_type)
+                index = geometry.tile_index(x, y)
+                if unit_stats is None or index == -1 or edge_of[index] == -1 or index in self._firewall_at:
+                    warnings.warn("Could not simulate {} at location {}. It is not an information unit on a free edge location.".format(unit_type, [x, y]))
+                    continue
+                group = groups.get((player_index, unit_type, index))
+                if group is None:
+                    group = groups[(player_index, unit_type, index)] = len(owner)
+                    edge = (edge_of[index] + 2) % 4
+                    owner.append(player_index)
+                    xs.append(x)
+                    ys.append(y)
+                    tiles.append(index)
+                    stats.append(unit_stats)
+                    paths.append(path_state.find_path_to_edge([x, y], edge))
+                    path_step.append(0)
+                    path_layout.append(layout)
+                    moved.append(0)
+                    target_edge.append(edge)
+                    shielded.append(set())
+                    shield_tile.append(-1)
+                    near.append(None)
+                    near_tile.append(-1)
+                group_of.append(group)
+                stability.append(unit_stats[5])
+                shield.append(0)
+
+        # Per group: 1 once it reached its target edge, 2 once it could not move any further
+        leaving = [0] * len(owner)
+        # Per group, this frame: its weakest unit, the attack its units make on an information unit, or else on a firewall
+        weakest = [-1] * len(owner)
+        unit_hit = [None] * len(owner)
+        firewall_hit = [None] * len(owner)
+        # Per firewall, this frame: the unit it targets and that unit's squared distance
+        fw_target = [-1] * len(fw_x)
+        fw_distance = [0] * len(fw_x)
+        # Information units only target each other when the players' units are closer in y than the longest reach
+        max_reach = max([unit_stats[4] for unit_stats in stats] + [0]) + 0.51
+        alive = list(range(len(stability)))
+        seen_alive = None
+        # False while every unit's shield is down
+        shields_up = False
+        frame = 0
+        while alive and frame < max_frames:
+            frame += 1
+            fallen = []
+            # Whether any group moved, left or lost units since the tables below were last built
+            changed = False
+
+            # The groups with units left, ordered by their first unit, and the units in each of them
+            if alive is not seen_alive:
+                seen_alive = alive
+                members = [[] for _ in owner]
+                live = []
+                for i in alive:
+                    group = group_of[i]
+                    if not members[group]:
+                        live.append(group)
+                    members[group].append(i)
+                changed = True
+                weakest_stale = True
+
+            # Movement, scoring and self destruction
+            leaving_any = False
+            for g in live:
+                unit_stats = stats[g]
+                if frame % unit_stats[0]:
+                    continue
+                path = paths[g]
+                if path_layout[g] != layout and self._reroute:
+                    path = paths[g] = path_state.find_path_to_edge([xs[g], ys[g]], target_edge[g])
+                    path_step[g] = 0
+                    path_layout[g] = layout
+                step = path_step[g] + 1
+                if step < len(path):
+                    x, y = path[step]
+                    xs[g] = x
+                    ys[g] = y
+                    tiles[g] = x * size + y
+                    path_step[g] = step
+                    moved[g] += 1
+                    changed = True
+                    if step < len(path) - 1 or edge_of[tiles[g]] != target_edge[g]:
+                        continue
+                    leaving[g] = 1
+                else:
+                    leaving[g] = 2
+                leaving_any = True
+            if leaving_any:
+                # Unit by unit, in the order they were deployed
+                for i in alive:
+                    g = group_of[i]
+                    if leaving[g] == 1:
+                        result.damage_dealt[owner[g]] += stats[g][6]
+                        result.breaches[owner[g]].append([xs[g], ys[g]])
+                    elif leaving[g] == 2:
+                        result.units_lost[owner[g]] += 1
+                        if moved[g] >= self._self_destruct_steps:
+                            for f in self.__firewalls_near(tiles[g], self._self_destruct_radius):
+                                if fw_owner[f] != owner[g] and fw_stability[f] > 0:
+                                    dealt = min(stats[g][5], fw_stability[f])
+                                    fw_stability[f] -= dealt
+                                    result.firewall_damage[owner[g]] += dealt
+                                    if fw_stability[f] <= 0:
+                                        fallen.append(f)
+                alive = seen_alive = [i for i in alive if not leaving[group_of[i]]]
+                live = [g for g in live if not leaving[g]]
+                changed = True
+
+            if changed:
+                periods = {stats[g][0] for g in live}
+                by_player = ([], [])
+                for g in live:
+                    by_player[owner[g]].append(g)
+                contact = False
+                if by_player[0] and by_player[1]:
+                    top_0 = max([ys[g] for g in by_player[0]])
+                    bottom_1 = min([ys[g] for g in by_player[1]])
+                    contact = bottom_1 - top_0 < max_reach and min([ys[g] for g in by_player[0]]) - max([ys[g] for g in by_player[1]]) < max_reach
+
+            # Shields. A group that stayed on its tile already has the shields of every encryptor covering it
+            if shields_up:
+                shields_up = False
+                for i in alive:
+                    if shield[i] > 0:
+                        shield[i] = shield[i] - shield_decay if shield[i] > shield_decay else 0
+                        shields_up = True
+            for g in live:
+                tile = tiles[g]
+                if tile != shield_tile[g]:
+                    shield_tile[g] = tile
+                    for f in shielders[owner[g]].get(tile, ()):
+                        if fw_stability[f] > 0 and f not in shielded[g]:
+                            shielded[g].add(f)
+                            for i in members[g]:
+                                shield[i] += fw_shield[f]
+                            shields_up = True
+
+            # Targets are chosen before any damage is dealt, so every attack in a frame happens at once.
+            # The units of a group share a location, so only the weakest one can be the best target
+            if weakest_stale:
+                weakest_stale = False
+                for g in live:
+                    weakest[g] = min(members[g], key=stability.__getitem__) if len(members[g]) > 1 else members[g][0]
+            unit_hits = []
+            firewall_hits = []
+            attacking = []
+            for g in live:
+                covering = defenders[owner[g]].get(tiles[g])
+                if covering is None:
+                    continue
+                i = weakest[g]
+                x = xs[g]
+                y = ys[g]
+                for f, distance in covering:
+                    if fw_stability[f] > 0:
+                        j = fw_target[f]
+                        if j == -1:
+                            attacking.append(f)
+                        elif distance > fw_distance[f]:
+                            continue
+                        elif distance == fw_distance[f]:
+                            other = group_of[j]
+                            if not ((stability[i], y, -abs(2 * x - 27), x, i) <
+                                    (stability[j], ys[other], -abs(2 * xs[other] - 27), xs[other], j)):
+                                continue
+                        fw_target[f] = i
+                        fw_distance[f] = distance
+            for f in attacking:
+                unit_hits.append((fw_target[f], fw_damage[f]))
+                fw_target[f] = -1
+
+            group_attacks = False
+            for g in live:
+                unit_hit[g] = None
+                firewall_hit[g] = None
+                unit_stats = stats[g]
+                if contact:
+                    x = xs[g]
+                    y = ys[g]
+                    reach = unit_stats[3]
+                    best = -1
+                    best_key = None
+                    for other in by_player[1 - owner[g]]:
+                        distance = (xs[other] - x) * (xs[other] - x) + (ys[other] - y) * (ys[other] - y)
+                        if distance < reach:
+                            j = weakest[other]
+                            key = (distance, stability[j], ys[other], -abs(2 * xs[other] - 27), xs[other], j)
+                            if best_key is None or key < best_key:
+                                best = j
+                                best_key = key
+                    if best != -1:
+                        if unit_stats[2]:
+                            unit_hit[g] = (best, unit_stats[2])
+                            group_attacks = True
+                        continue
+                if not unit_stats[7] or not unit_stats[1]:
+                    continue
+                if near_tile[g] != tiles[g]:
+                    near_tile[g] = tiles[g]
+                    near[g] = self.__enemy_firewalls_near(tiles[g], unit_stats[4], owner[g])
+                best = -1
+                for f, distance in near[g]:
+                    if fw_stability[f] <= 0:
+                        continue
+                    if best == -1:
+                        best = f
+                        best_distance = distance
+                    elif distance != best_distance:
+                        break
+                    elif fw_stability[f] < fw_stability[best]:
+                        best = f
+                if best != -1:
+                    firewall_hit[g] = (best, unit_stats[1], owner[g])
+                    group_attacks = True
+            if group_attacks:
+                for i in alive:
+                    g = group_of[i]
+                    if unit_hit[g] is not None:
+                        unit_hits.append(unit_hit[g])
+                    elif firewall_hit[g] is not None:
+                        firewall_hits.append(firewall_hit[g])
+
+            # Damage
+            weakest_stale = weakest_stale or bool(unit_hits)
+            for i, damage in unit_hits:
+                if shield[i] >= damage:
+                    shield[i] -= damage
+                else:
+                    stability[i] -= damage - shield[i]
+                    shield[i] = 0
+            for f, damage, attacker in firewall_hits:
+                if fw_stability[f] > 0:
+                    dealt = min(damage, fw_stability[f])
+                    fw_stability[f] -= dealt
+                    result.firewall_damage[attacker] += dealt
+                    if fw_stability[f] <= 0:
+                        fallen.append(f)
+
+            # Removal
+            if unit_hits:
+                destroyed = [i for i in alive if stability[i] <= 0]
+                if destroyed:
+                    for i in destroyed:
+                        result.units_lost[owner[group_of[i]]] += 1
+                    alive = [i for i in alive if stability[i] > 0]
+            for f in fallen:
+                result.firewalls_destroyed[fw_owner[f]].append([fw_x[f], fw_y[f]])
+                if not forked:
+                    path_state = path_state.fork()
+                    forked = True
+                path_state.game_map.remove_unit([fw_x[f], fw_y[f]])
+                layout += 1
+
+            # Without attacks nothing changes until the next group moves, only shields decay
+            if alive and not unit_hits and not firewall_hits:
+                next_move = min((frame // period + 1) * period for period in periods)
+                if next_move > max_frames:
+                    frame = max_frames
+                    break
+                if shields_up:
+                    for i in alive:
+                        for _ in range(next_move - 1 - frame):
+                            if shield[i] <= 0:
+                                break
+                            shield[i] = shield[i] - shield_decay if shield[i] > shield_decay else 0
+                frame = next_move - 1
+
+        result.frames = frame
+        return result
@@ -0,0 +1,121 @@
+import struct
+import sys
+
+from .game_config import compile_config
+
+"""
+A compact binary format for game states. A snapshot is a fixed size header followed by one
+array per unit attribute, so it can be written in one pass, read straight out of any buffer,
+such as shared memory, and compared byte for byte.
+
+Layout, little endian:
+    * Header: magic, version, turn number, then health, cores, bits and time of each player,
+      then the number of units and the number of queued spawns, padded to 8 bytes
+    * Units, in the order GameMap iterates over them: type code, owner, x, y and pending removal
+      as one uint8 array each, padded to 8 bytes, then stability as a float64 array
+    * Queued spawns: (stack, type code, x, y) as 4 uint8 each, stack 0 for builds and 1 for deploys
+"""
+
+MAGIC = b"GLSS"
+VERSION = 2
+# Padded so the float64 stability array that follows the uint8 columns is 8 byte aligned
+HEADER = struct.Struct("<4sHi8dII6x")
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _padded(size):
+    return (size + 7) // 8 * 8
+
+
+def read_header(buffer):
+    """Reads the header of a snapshot
+
+    Args:
+        * buffer: A snapshot, as any object supporting the buffer protocol
+
+    Returns:
+        A tuple of the turn number, the health, cores, bits and time of each player, the number of units,
+        the number of queued spawns, and the offsets of the unit columns, the stability array and the spawns
+
+    """
+    (magic, version, turn_number, my_health, my_cores, my_bits, my_time,
+     enemy_health, enemy_cores, enemy_bits, enemy_time, count, stack_count) = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a version {} game state snapshot".format(VERSION))
+    columns_offset = HEADER.size
+    stability_offset = columns_offset + _padded(5 * count)
+    spawns_offset = stability_offset + 8 * count
+    return (turn_number, my_health, my_cores, my_bits, my_time, enemy_health, enemy_cores, enemy_bits, enemy_time,
+            count, stack_count, columns_offset, stability_offset, spawns_offset)
+
+
+def to_bytes(game_state):
+    """Packs a game state into a snapshot, see GameState.to_bytes
+    """
+    entries = game_state.game_map._snapshot_entries()
+    type_code = game_state.game_config.type_code
+    stacks = [(0, spawn) for spawn in game_state._build_stack] + [(1, spawn) for spawn in game_state._deploy_stack]
+    resources = game_state._player_resources
+    header = HEADER.pack(MAGIC, VERSION, game_state.turn_number,
+                         game_state.my_health, resources[0]["cores"], resources[0]["bits"], game_state.my_time,
+                         game_state.enemy_health, resources[1]["cores"], resources[1]["bits"], game_state.enemy_time,
+                         len(entries), len(stacks))
+    count = len(entries)
+    columns = bytearray(_padded(5 * count))
+    for row, (x, y, unit_type, player_index, stability, pending_removal) in enumerate(entries):
+        columns[row] = type_code(unit_type)
+        columns[count + row] = player_index
+        columns[2 * count + row] = x
+        columns[3 * count + row] = y
+        columns[4 * count + row] = 1 if pending_removal else 0
+    # Removal markers have no stability
+    stabilities = struct.pack("<{}d".format(count), *(entry[4] or 0 for entry in entries))
+    spawns = bytes(value for stack, (unit_type, x, y) in stacks for value in (stack, type_code(unit_type), x, y))
+    return b"".join((header, columns, stabilities, spawns))
+
+
+def from_buffer(config, buffer, state_class):
+    """Builds a game state from a snapshot, see GameState.from_buffer
+    """
+    game_config = compile_config(config)
+    unit_types = game_config.unit_types
+    with memoryview(buffer) as view:
+        (turn_number, my_health, my_cores, my_bits, my_time, enemy_health, enemy_cores, enemy_bits, enemy_time,
+         count, stack_count, offset, stability_offset, spawns_offset) = read_header(view)
+        columns = view[offset:offset + 5 * count]
+        if _LITTLE_ENDIAN:
+            with view[stability_offset:spawns_offset].cast("d") as stability_view:
+                stabilities = stability_view.tolist()
+        else:
+            stabilities = struct.unpack_from("<{}d".format(count), view, stability_offset)
+        entries = [(columns[2 * count + row], columns[3 * count + row], unit_types[columns[row]], columns[count + row],
+                    stabilities[row], columns[4 * count + row] == 1) for row in range(count)]
+        spawns = [(view[index], unit_types[view[index + 1]], view[index + 2], view[index + 3])
+                  for index in range(spawns_offset, spawns_offset + 4 * stack_count, 4)]
+        columns.release()
+
+    empty_units = [[] for _ in unit_types]
+    state = {
+        "turnInfo": [0, turn_number, -1],
+        "p1Stats": [my_health, my_cores, my_bits, my_time],
+        "p2Stats": [enemy_health, enemy_cores, enemy_bits, enemy_time],
+        "p1Units": empty_units,
+        "p2Units": empty_units,
+    }
+    game_state = state_class(game_config, None, state=state)
+    game_state.game_map._load_entries(entries)
+    for stack, unit_type, x, y in spawns:
+        (game_state._build_stack if stack == 0 else game_state._deploy_stack).append((unit_type, x, y))
+    return game_state
+
+
+def to_shared_memory(game_state, name=None):
+    """Packs a game state into a new block of shared memory, see GameState.to_shared_memory
+    """
+    from multiprocessing import shared_memory
+
+    data = to_bytes(game_state)
+    block = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+    block.buf[:len(data)] = data
+    return block
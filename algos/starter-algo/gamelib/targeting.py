@@ -0,0 +1,117 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from . import geometry
+
+"""
+Choosing the targets of many attackers at once. Every attacker's choice is resolved together
+with array operations when NumPy is available, and with a plain loop otherwise. NumPy is
+optional, the results are the same either way.
+"""
+
+# Below this many attacker and target pairs, a plain loop is faster than building arrays
+VECTORIZE_MIN_PAIRS = 256
+
+_reach = {}
+_reach_masks = {}
+
+
+def _tiles_in_range(x, y, attack_range):
+    """The flat indices of the tiles an attacker reaches, the same tiles GameMap.get_locations_in_range returns
+    """
+    key = (x, y, attack_range)
+    tiles = _reach.get(key)
+    if tiles is None:
+        if type(x) == int and type(y) == int and geometry.tile_index(x, y) != -1:
+            locations = geometry.locations_in_range(x, y, attack_range)
+        else:
+            locations = [(i, j) for i in range(int(x - attack_range), int(x + attack_range + 1))
+                         for j in range(int(y - attack_range), int(y + attack_range + 1))
+                         if geometry.in_bounds(i, j) and math.sqrt((i - x) ** 2 + (j - y) ** 2) < attack_range + 0.51]
+        tiles = frozenset(i * geometry.ARENA_SIZE + j for i, j in locations)
+        _reach[key] = tiles
+    return tiles
+
+
+def _reach_mask(x, y, attack_range):
+    """_tiles_in_range as a boolean array over every flat tile index
+    """
+    key = (x, y, attack_range)
+    mask = _reach_masks.get(key)
+    if mask is None:
+        mask = np.zeros(geometry.TILE_COUNT, dtype=bool)
+        mask[list(_tiles_in_range(x, y, attack_range))] = True
+        _reach_masks[key] = mask
+    return mask
+
+
+def resolve_targets(attackers, targets):
+    """Chooses the target of every attacker
+
+    The targeting priority is the one described in AdvancedGameState.get_target:
+        Information over firewalls > Nearest > Lowest stability > Lowest y > Furthest from the center of the board in x
+    Attackers never target units of their own player, and attackers that ignore firewalls, such as
+    scramblers, never target firewalls. A target is in range when its tile is one of the tiles
+    GameMap.get_locations_in_range returns for the attacker, the same tiles get_target looks at.
+    Remaining ties go to the target that comes first.
+
+    Args:
+        * attackers: A list of (x, y, player_index, range, ignores_firewalls) tuples. A range of None means every target is in range
+        * targets: A list of (x, y, player_index, stationary, stability) tuples
+
+    Returns:
+        A list with the index in targets of the target of each attacker, -1 for attackers without a target
+
+    """
+    if not attackers:
+        return []
+    if not targets:
+        return [-1] * len(attackers)
+    if np is not None and len(attackers) * len(targets) >= VECTORIZE_MIN_PAIRS:
+        return _resolve_arrays(attackers, targets)
+    return [_resolve_one(attacker, targets) for attacker in attackers]
+
+
+def _resolve_one(attacker, targets):
+    x, y, player_index, attack_range, ignores_firewalls = attacker
+    reach = None if attack_range is None else _tiles_in_range(x, y, attack_range)
+    chosen = -1
+    chosen_key = None
+    for index, (target_x, target_y, owner, stationary, stability) in enumerate(targets):
+        if owner == player_index or (ignores_firewalls and stationary):
+            continue
+        if reach is not None and target_x * geometry.ARENA_SIZE + target_y not in reach:
+            continue
+        distance = (target_x - x) ** 2 + (target_y - y) ** 2
+        key = (bool(stationary), distance, stability, target_y, -abs(2 * target_x - 27))
+        if chosen_key is None or key < chosen_key:
+            chosen = index
+            chosen_key = key
+    return chosen
+
+
+def _resolve_arrays(attackers, targets):
+    attacker_x, attacker_y, attacker_owner, attack_range, ignores_firewalls = zip(*attackers)
+    target_x, target_y, target_owner, stationary, stability = (np.array(column, dtype=float) for column in zip(*targets))
+    target_tile = (target_x * geometry.ARENA_SIZE + target_y).astype(np.intp)
+    everywhere = np.ones(geometry.TILE_COUNT, dtype=bool)
+    reach = np.stack([everywhere if attack_range[row] is None else _reach_mask(attacker_x[row], attacker_y[row], attack_range[row])
+                      for row in range(len(attackers))])
+    attacker_x = np.array(attacker_x, dtype=float)[:, None]
+    attacker_y = np.array(attacker_y, dtype=float)[:, None]
+
+    distance = (target_x - attacker_x) ** 2 + (target_y - attacker_y) ** 2
+    valid = (np.array(attacker_owner, dtype=float)[:, None] != target_owner) & reach[:, target_tile]
+    valid &= ~(np.array(ignores_firewalls, dtype=bool)[:, None] & (stationary != 0))
+
+    # Narrow each attacker's candidates down one priority at a time, keeping every candidate tied for the best value
+    for criterion in (stationary != 0, distance, stability, target_y, -np.abs(2 * target_x - 27)):
+        values = np.where(valid, criterion, np.inf)
+        valid &= values == values.min(axis=1, keepdims=True)
+    chosen = valid.argmax(axis=1)
+    chosen[~valid.any(axis=1)] = -1
+    return chosen.tolist()
@@ -1,8 +1,30 @@
 import unittest
+import sys
 import json
+import io
+import time
+import timeit
+import contextlib
+import multiprocessing
+import gc
+import random
+import threading
+import weakref
 from .game_state import GameState
+from .algocore import AlgoCore
 from .unit import GameUnit
 from .advanced_game_state import AdvancedGameState
+from .board_planes import np
+from .game_config import compile_config
+from . import frames
+from .background import BackgroundPlanner
+from .scheduler import TurnScheduler
+from .simulation import ActionSimulator
+from . import targeting
+from . import snapshot
+from . import rollouts
+from .rollouts import RolloutPool, deploy_candidates
+from .batch import BoardBatch
 
 class BasicTests(unittest.TestCase):
 
@@ -240,3 +262,666 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_bits(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} power {} turns from now, got {}".format(expected, turns, actual))
 
+
+    def test_pathing(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        path = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual([13, 0], path[0], "Paths should begin at the start location")
+        self.assertEqual([27, 14], path[-1], "Unit should zig zag to the far end of the top right edge")
+        self.assertEqual(29, len(path), "Path on an empty board has the wrong length")
+
+        for x in range(3, 25):
+            game.game_map.add_unit("FF", [x, 10])
+        path = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual([23, 9], path[-1], "Walled in unit should path to its best self destruct location")
+        self.assertEqual(None, game.find_path_to_edge([13, 10], game.game_map.TOP_RIGHT), "Pathing from a blocked tile should fail")
+
+    def test_path_cache(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        first = game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual(first, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), "Cached path differs from the computed one")
+        self.assertEqual((1, 1), (game.path_cache.hits, game.path_cache.misses), "Second query should be a cache hit")
+
+        empty_hash = game.game_map.blocker_hash
+        game.game_map.add_unit("FF", [13, 1])
+        self.assertNotEqual(empty_hash, game.game_map.blocker_hash, "Adding a firewall should change the blocker hash")
+        self.assertNotEqual(first, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), "Path should change around the new firewall")
+        self.assertEqual(2, game.path_cache.misses, "A new firewall should invalidate cached paths")
+
+        game.game_map.add_unit("PI", [13, 2])
+        game.game_map.remove_unit([13, 1])
+        self.assertEqual(empty_hash, game.game_map.blocker_hash, "Information units should not affect the blocker hash")
+        self.assertEqual(first, game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), "Removing the firewall should restore the old path")
+        self.assertEqual(2, game.path_cache.hits, "The old path should still be cached")
+
+    def test_paths_from_edges(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        for x in range(3, 25):
+            game.game_map.add_unit("FF", [x, 10])
+        game.game_map.add_unit("FF", [5, 8])
+        game.game_map.add_unit("FF", [20, 6])
+        starts = game.game_map.get_edge_locations(game.game_map.BOTTOM_LEFT) + game.game_map.get_edge_locations(game.game_map.BOTTOM_RIGHT)
+        paths = game.find_paths_from_edges([game.game_map.BOTTOM_LEFT, game.game_map.BOTTOM_RIGHT], game.game_map.TOP_RIGHT)
+        self.assertEqual(len(starts), len(paths), "There should be one path per start location")
+        reference = self.make_turn_0_map(adv)
+        for x in range(3, 25):
+            reference.game_map.add_unit("FF", [x, 10])
+        reference.game_map.add_unit("FF", [5, 8])
+        reference.game_map.add_unit("FF", [20, 6])
+        for location, path in zip(starts, paths):
+            if location in ([5, 8], [20, 6]):
+                self.assertEqual(None, path, "Blocked start locations have no path")
+            else:
+                self.assertEqual(reference.find_path_to_edge(location, reference.game_map.TOP_RIGHT), path, "Batched path differs at {}".format(location))
+
+    def test_path_field(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        field = game.create_path_field(game.game_map.TOP_RIGHT)
+        self.assertEqual(game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), field.navigate([13, 0]), "Field path differs on an empty board")
+
+        field.block([14, 1])
+        self.assertEqual(1, field.rebuilds, "Blocking an open tile should not recompute the whole field")
+        game.game_map.add_unit("FF", [14, 1])
+        self.assertEqual(game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), field.navigate([13, 0]), "Field path differs after blocking a tile")
+
+        for x in range(3, 25):
+            field.block([x, 10])
+            game.game_map.add_unit("FF", [x, 10])
+        self.assertEqual(game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), field.navigate([13, 0]), "Field path differs once the edge is walled off")
+        self.assertEqual(-1, field.pathlength([13, 10]), "Blocked tiles have no pathlength")
+
+        field.unblock([13, 10])
+        game.game_map.remove_unit([13, 10])
+        self.assertEqual(game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT), field.navigate([13, 0]), "Field path differs after opening the wall")
+        self.assertEqual(None, field.navigate([14, 1]), "Pathing from a blocked tile should fail")
+
+    def test_edges_and_bounds(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        self.assertEqual(420, sum(1 for x in range(-1, 29) for y in range(-1, 29) if game_map.in_arena_bounds([x, y])), "The arena should have 420 tiles")
+        self.assertTrue(game_map.in_arena_bounds([13.5, 0.5]), "Non integer locations should still be bounds checked")
+        self.assertEqual([[14, 27], [13, 27], [13, 0], [14, 0]], [edge[0] for edge in game_map.get_edges()], "Edges are out of order")
+        for edge in range(4):
+            for location in game_map.get_edge_locations(edge):
+                self.assertEqual(edge, game_map.get_edge_of(location), "{} should be on edge {}".format(location, edge))
+        self.assertEqual(-1, game_map.get_edge_of([13, 13]), "The center of the map is not on an edge")
+
+    def test_board_planes(self, adv=False):
+        if np is None:
+            return
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 12], 0)
+        planes = game.game_map.enable_planes()
+        self.assertEqual(1, planes.count_units("DF", 0), "Units already on the map should be in the planes")
+        game.game_map.add_unit("DF", [14, 12], 0)
+        game.game_map.add_unit("FF", [14, 15], 1)
+        for _ in range(3):
+            game.game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(2, planes.count_units("DF", 0), "There should be two friendly destructors")
+        self.assertEqual(3, planes.count_units("PI"), "Stacked pings should all be counted")
+        self.assertEqual(150, planes.total_stability(player_index=0, region=planes.firewall_mask() & planes.half(0)), "Wrong firewall health on my half")
+        self.assertEqual([[14, 15]], planes.locations(planes.mask("FF", 1)), "Enemy filter is missing")
+
+        game.game_map.remove_unit([13, 12])
+        game.game_map[14, 15] = []
+        self.assertEqual(1, planes.count_units(["DF", "FF"]), "Removed firewalls should leave the planes")
+        self.assertEqual(-1, planes.unit_type[14, 15], "Emptied tile should have no unit type")
+
+    def test_map_iteration(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        locations = list(game_map)
+        self.assertEqual(420, len(locations), "Iteration should visit every tile once")
+        self.assertEqual([[13, 0], [14, 0], [12, 1]], locations[:3], "Iteration should start at the bottom of the map")
+        nested = sum(1 for location in game_map for other in game_map if location == other)
+        self.assertEqual(420, nested, "Nested loops over the map should not interfere")
+
+        self.assertEqual([], list(game_map.iter_occupied()), "An empty map has no occupied tiles")
+        game_map.add_unit("FF", [14, 15], 1)
+        game_map.add_unit("DF", [13, 12], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual([[13, 0], [13, 12], [14, 15]], list(game_map.iter_occupied()), "Occupied tiles are wrong")
+        self.assertEqual([[13, 12], [14, 15]], list(game_map.iter_stationary()), "Stationary tiles are wrong")
+        self.assertEqual([[14, 15]], list(game_map.iter_stationary(1)), "Enemy stationary tiles are wrong")
+        game_map.remove_unit([13, 12])
+        self.assertEqual([[13, 0], [14, 15]], list(game_map.iter_occupied()), "Removed units should leave the occupied tiles")
+
+    def test_range_tables(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        in_range = game_map.get_locations_in_range([13, 13], 3.5)
+        self.assertEqual(len(in_range), len(set(map(tuple, in_range))), "Locations in range should not repeat")
+        self.assertEqual(in_range, game_map.get_locations_in_range([13, 13], 3.5), "Cached ranges should be stable")
+        in_range.append([0, 0])
+        self.assertNotIn([0, 0], game_map.get_locations_in_range([13, 13], 3.5), "Callers should not be able to modify the cached ranges")
+        self.assertEqual(5, len(game_map.get_locations_in_range([13, 0], 1.5)), "Ranges should be clipped to the arena")
+        self.assertAlmostEqual(5 ** 0.5, game_map.distance_between_locations([13, 13], [14, 15]), 10, "Distance table is wrong")
+        self.assertEqual(2.5, game_map.distance_between_locations([0, 0], [1.5, 2]), "Non integer distances should still work")
+
+    def test_fork(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 12], 0)
+        fork = game.fork()
+        self.assertEqual(1, len(fork.game_map[13, 12]), "Forks should see the units of the original map")
+        fork.game_map[13, 12][0].stability = 1
+        fork.attempt_spawn("FF", [14, 12])
+        fork.game_map.remove_unit([13, 12])
+        self.assertEqual(75, game.game_map[13, 12][0].stability, "Changing a unit on a fork should not affect the original")
+        self.assertEqual([], game.game_map[14, 12], "Spawning on a fork should not affect the original")
+        self.assertEqual(25, game.get_resource(game.CORES), "Spending on a fork should not affect the original")
+        self.assertNotEqual(game.game_map.blocker_hash, fork.game_map.blocker_hash, "Forks keep their own blocker hash")
+
+        fork.commit()
+        self.assertEqual([], game.game_map[13, 12], "Committed removals should show up on the original")
+        self.assertEqual("FF", game.game_map[14, 12][0].unit_type, "Committed spawns should show up on the original")
+        self.assertEqual([("FF", 14, 12)], game._build_stack, "Committed spawns should be queued on the original")
+        self.assertEqual(fork.game_map.blocker_hash, game.game_map.blocker_hash, "Committing should carry over the blocker hash")
+        game.game_map.add_unit("FF", [15, 12])
+        self.assertEqual([], fork.game_map[15, 12], "The fork should stay independent after committing")
+
+    def test_board_hash(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        empty = game.game_map.board_hash
+        game.game_map.add_unit("DF", [13, 12], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        game.game_map.add_unit("PI", [13, 0], 0)
+        placed = game.game_map.board_hash
+        self.assertNotEqual(empty, placed, "Adding units should change the board hash")
+
+        other = self.make_turn_0_map(adv)
+        other.game_map.add_unit("PI", [13, 0], 0)
+        other.game_map.add_unit("DF", [13, 12], 0)
+        other.game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(placed, other.game_map.board_hash, "The board hash should not depend on the order units were added")
+        other.game_map.remove_unit([13, 0])
+        other.game_map.add_unit("PI", [13, 0], 1)
+        self.assertNotEqual(placed, other.game_map.board_hash, "The board hash should depend on the number and owner of units")
+
+        blockers = game.game_map.blocker_hash
+        game.game_map.add_unit("PI", [14, 0], 0)
+        self.assertEqual(blockers, game.game_map.blocker_hash, "Information units should not change the blocker hash")
+        game.game_map.remove_unit([14, 0])
+        self.assertEqual(placed, game.game_map.board_hash, "Removing a unit should restore the board hash")
+        game.game_map[13, 12] = []
+        game.game_map[13, 0] = []
+        self.assertEqual(empty, game.game_map.board_hash, "Emptying the board should restore the empty hash")
+
+    def test_unit_index(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game_map = game.game_map
+        game_map.add_unit("DF", [13, 12], 0)
+        game_map.add_unit("DF", [12, 12], 0)
+        game_map.add_unit("DF", [13, 14], 1)
+        game_map.add_unit("PI", [13, 0], 0)
+        game_map.add_unit("PI", [13, 0], 0)
+        self.assertEqual(2, game_map.count(0, "DF"), "We should have two destructors")
+        self.assertEqual(1, game_map.count(1, "DF"), "The enemy should have one destructor")
+        self.assertEqual(2, game_map.count(0, "PI"), "Stacked pings should each be counted")
+        self.assertEqual(0, game_map.count(1, "EF"), "No encryptors were placed")
+        self.assertEqual([[12, 12], [13, 12]], game_map.locations_of(0, "DF"), "Locations should follow map iteration order")
+        self.assertEqual(2, len(game_map.units_of(0, "PI")), "Both stacked pings should be returned")
+
+        game_map.remove_unit([12, 12])
+        game_map[13, 0] = []
+        game_map.add_unit("FF", [14, 15], 1)
+        self.assertEqual([[13, 12]], [[unit.x, unit.y] for unit in game_map.units_of(0, "DF")], "Removed units should leave the index")
+        self.assertEqual(0, game_map.count(0, "PI"), "Replaced tiles should leave the index")
+        self.assertEqual(1, game_map.count(1, "FF"), "New units should join the index")
+
+        fork = game_map.fork()
+        fork.remove_unit([13, 12])
+        self.assertEqual(0, fork.count(0, "DF"), "Forks keep their own index")
+        self.assertEqual(1, game_map.count(0, "DF"), "Changing a fork should not change the original index")
+
+    def test_parse_state(self, adv=False):
+        config = self.make_turn_0_map(adv).config
+        state = {"p2Units":[[[13,14,60.0,"1"]],[],[[14,14,0,"2"]],[],[],[],[]],"turnInfo":[0,3,-1],"p1Stats":[25.0,10.0,7.0,0],
+                 "p1Units":[[],[],[[13,12,75.0,"3"]],[[13,0,15.0,"4"],[13,0,15.0,"5"]],[],[],[]],"p2Stats":[30.0,25.0,5.0,0]}
+        serialized = json.dumps(state)
+        game = AdvancedGameState(config, serialized, state=state) if adv else GameState(config, serialized, state=state)
+        same_game = GameState(config, serialized)
+        self.assertEqual(3, game.turn_number, "A decoded state should be accepted")
+        self.assertEqual(serialized, game.serialized_string, "The serialized string should be kept as it was sent")
+        self.assertEqual(same_game.game_map.board_hash, game.game_map.board_hash, "Decoded and serialized states should match")
+        self.assertEqual(1, game.game_map.count(1, "DF"), "Parsed units should be indexed before any tile is accessed")
+        self.assertEqual([[13, 12], [13, 14], [14, 14]], list(game.game_map.iter_stationary()), "Parsed firewalls should block")
+        self.assertEqual(2, len(game.game_map[13, 0]), "Stacked units should both be parsed")
+        self.assertEqual(60, game.game_map[13, 14][0].stability, "Parsed stability is wrong")
+        self.assertEqual(75, game.game_map[14, 14][0].stability, "Units without a stability should be at full stability")
+        self.assertEqual(1, game.game_map[14, 14][0].player_index, "Parsed owner is wrong")
+
+    def test_unit_stats(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        first = GameUnit("EF", game.config, 0, None, 13, 12)
+        second = GameUnit("EF", game.config, 1, 5, 14, 14)
+        self.assertIs(first.stats, second.stats, "Units of the same type should share their stats")
+        self.assertFalse(hasattr(first, "__dict__"), "Units should not carry a dict of attributes")
+        self.assertEqual(10, first.damage, "An encryptor's damage is its shield amount")
+        self.assertEqual((30, 5), (first.stability, second.stability), "Stability should default to the maximum")
+        self.assertTrue(first.stationary, "Encryptors are firewalls")
+        ping = GameUnit("PI", game.config)
+        self.assertEqual((0.5, 1, 1), (ping.speed, ping.damage_f, ping.damage_i), "Ping stats are wrong")
+
+        state = {"p2Units":[[],[],[],[],[],[],[]],"turnInfo":[0,1,-1],"p1Stats":[30.0,25.0,5.0,0],
+                 "p1Units":[[[13,12,60.0,"1"]],[],[],[],[],[],[[13,12,0,"2"]]],"p2Stats":[30.0,25.0,5.0,0]}
+        removing = GameState(game.config, json.dumps(state))
+        self.assertTrue(removing.game_map[13, 12][0].pending_removal, "Units marked for removal should be flagged")
+
+    def test_game_config(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        other = GameState(game.config, game.serialized_string)
+        self.assertIs(game.game_config, other.game_config, "A config should only be compiled once")
+        self.assertIs(game.game_config, compile_config(game.game_config), "Compiling a GameConfig should return it")
+        config = json.loads(json.dumps(game.config))
+        compiled = weakref.ref(compile_config(config))
+        gc.collect()
+        self.assertIsNone(compiled(), "Compiled configs nobody holds should not be kept alive")
+        self.assertIsNot(game.game_config, compile_config(config), "A different config object should get its own GameConfig")
+        with self.assertRaises(AttributeError):
+            game.game_config.FILTER = "XX"
+        self.assertEqual(frozenset(["FF", "EF", "DF"]), game.FIREWALL_TYPES, "Firewall types are wrong")
+        self.assertEqual(2, game.game_config.type_code("DF"), "Type codes should follow the config")
+        self.assertEqual(game.CORES, game.game_config.resource_types[game.game_config.type_code("EF")], "Firewalls cost cores")
+        self.assertEqual(4, game.type_cost("EF"), "Encryptor cost is wrong")
+
+        scrambler = GameUnit("SI", game.config, 1, None, 13, 14)
+        advanced = AdvancedGameState(game.game_config, game.serialized_string)
+        advanced.game_map.add_unit("FF", [13, 13], 0)
+        self.assertIsNone(advanced.get_target(scrambler), "Scramblers should not target firewalls")
+        advanced.game_map.add_unit("PI", [13, 12], 0)
+        self.assertEqual("PI", advanced.get_target(scrambler).unit_type, "Scramblers should target information units")
+
+    def test_update(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        state = {"p2Units":[[[13,14,60.0,"1"]],[],[],[],[],[],[]],"turnInfo":[0,1,-1],"p1Stats":[30.0,20.0,5.0,0],
+                 "p1Units":[[[13,12,60.0,"2"]],[],[],[],[],[],[]],"p2Stats":[30.0,25.0,5.0,0]}
+        self.assertEqual([[13, 12], [13, 14]], game.update(json.dumps(state)), "Both new firewalls should be applied")
+        game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        game.attempt_spawn("FF", [10, 12])
+        unchanged = game.game_map[13, 14][0]
+
+        state["turnInfo"] = [0, 2, -1]
+        state["p1Units"][3] = [[13, 0, 15.0, "3"]]
+        self.assertEqual([[13, 0], [10, 12]], game.update(json.dumps(state), state), "Only changed tiles should be replaced")
+        self.assertEqual(json.dumps(state), game.serialized_string, "The serialized string should be kept as it was sent")
+        self.assertEqual(2, game.turn_number, "The turn number should be updated")
+        self.assertEqual(20, game.get_resource(game.CORES), "Resources should be read from the new turn")
+        self.assertEqual([], game._build_stack, "Spawns from the previous turn should be discarded")
+        self.assertIs(unchanged, game.game_map[13, 14][0], "Unchanged tiles should keep their units")
+        game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)
+        self.assertEqual(1, game.path_cache.hits, "Paths should stay cached while the firewalls are unchanged")
+        fresh = GameState(game.config, json.dumps(state))
+        self.assertEqual(fresh.game_map.board_hash, game.game_map.board_hash, "An updated state should match a fresh one")
+
+    def test_algo_core(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        class Algo(AlgoCore):
+            def on_turn(self, turn_state):
+                self.seen = turn_state
+                self.persistent_game_state(turn_state, type(game))
+                self.submit_default_turn()
+        algo = Algo()
+        game_over = json.dumps({"turnInfo": [2, 1, -1]})
+        messages = io.StringIO("\n".join([json.dumps(game.config), game.serialized_string, game_over]) + "\n")
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            old_stdin, sys.stdin = sys.stdin, messages
+            try:
+                algo.start()
+            finally:
+                sys.stdin = old_stdin
+        self.assertEqual(game.serialized_string + "\n", algo.seen, "on_turn should get the string sent by the game")
+        self.assertEqual(json.loads(game.serialized_string), algo.turn_state, "The decoded turn should be in turn_state")
+        self.assertEqual(algo.seen, algo.game_state.serialized_string, "The game state should keep the string")
+        self.assertEqual(game.game_map.board_hash, algo.game_state.game_map.board_hash, "The game state was parsed wrong")
+
+    def test_action_frames(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        def frame(number, stability):
+            return json.dumps({"p2Units":[[],[],[[13,14,75.0,"8"]],[],[],[],[]],"turnInfo":[1,0,number],"p1Stats":[30.0,25.0,5.0,0],
+                               "p1Units":[[],[],[],[[13,number,stability,"7"]],[],[],[]],"p2Stats":[30.0,25.0,5.0,0]})
+        self.assertEqual(frames.TURN, frames.message_type(game.serialized_string), "Turn states are misclassified")
+        self.assertEqual(frames.ACTION_FRAME, frames.message_type(frame(0, 15.0)), "Action frames are misclassified")
+        self.assertEqual(frames.UNKNOWN, frames.message_type("{}"), "Messages without turnInfo are unknown")
+
+        messages = iter([frame(1, 11.0), frame(2, 11.0), game.serialized_string])
+        reader = frames.FrameReader(frame(0, 15.0), lambda: next(messages))
+        store = frames.FrameStore(game.config)
+        for decoded in reader.frames():
+            store.add(decoded)
+            if len(store) == 2:
+                break
+        self.assertEqual(game.serialized_string, reader.drain(), "Draining should stop at the next turn")
+        self.assertEqual(2, len(store), "Only the frames that were read should be stored")
+        self.assertEqual([("DF", 1, 13, 14, 75.0), ("PI", 0, 13, 1, 11.0)], sorted(store.units_in_frame(1)), "Stored units are wrong")
+        self.assertEqual([(0, 13, 0, 15.0), (1, 13, 1, 11.0)], store.track(7), "The ping should be tracked across frames")
+        self.assertEqual(4, store.damage_taken(0), "The ping lost 4 stability")
+        self.assertEqual(0, store.damage_taken(1), "The destructor was not damaged")
+
+    def test_background_planner(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        def plan(planner):
+            frames_seen = 0
+            while not planner.wait(0.001):
+                frames_seen += len(planner.new_frames())
+                planner.offer((planner.turn_state, frames_seen))
+        planner = BackgroundPlanner(plan, stop_timeout=1)
+        self.assertIsNone(planner.stop(), "A planner that never ran has no result")
+        planner.start(game.serialized_string)
+        self.assertTrue(planner.running, "The planner should be running after start")
+        self.assertEqual(2, len(list(planner.feed(iter([{}, {}])))), "Fed frames should be passed through")
+        while planner.result is None or planner.result[1] < 2:
+            planner.wait(0.001)
+        self.assertEqual((game.serialized_string, 2), planner.stop(), "The planner should have seen both frames")
+        self.assertFalse(planner.running, "The planner should stop when asked")
+        self.assertFalse(planner.offer("late"), "Offers after stopping should be ignored")
+
+        release = threading.Event()
+        released = threading.Event()
+        stale_frames = []
+        def slow_plan(planner):
+            if planner.turn_state == "first":
+                release.wait(1)
+                stale_frames.extend(planner.new_frames())
+                released.set()
+            else:
+                released.wait(1)
+                frames_seen = 0
+                while not planner.wait(0.001):
+                    frames_seen += len(planner.new_frames())
+                    planner.offer(frames_seen)
+        planner = BackgroundPlanner(slow_plan, stop_timeout=0.001)
+        planner.start("first")
+        planner.start("second")
+        for _ in planner.feed(iter([{}, {}])):
+            pass
+        release.set()
+        deadline = time.monotonic() + 1
+        while planner.result != 2 and time.monotonic() < deadline:
+            planner.wait(0.001)
+        planner.stop()
+        self.assertEqual([], stale_frames, "A replaced worker should not take frames meant for the next one")
+        self.assertEqual(2, planner.result, "The current worker should get every frame")
+
+    def test_turn_scheduler(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        scheduler = TurnScheduler(game.config)
+        self.assertEqual(70, scheduler.soft_limit, "The soft limit should be read from the config in seconds")
+        def work(depth):
+            if depth > 3:
+                return None
+            plan = game.fork()
+            plan.attempt_spawn("FF", [13, 10 + depth])
+            return -abs(depth - 2), plan
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            scheduler.begin_turn()
+            scheduler.add_work(work)
+            plan = scheduler.run()
+        self.assertEqual([["FF", 13, 12]], json.loads(output.getvalue().splitlines()[0]), "The best plan should be submitted")
+        self.assertIs(plan, scheduler.best_plan, "run should return the submitted plan")
+        self.assertEqual(4, scheduler.history[-1].steps, "Every depth should have been tried")
+        self.assertFalse(scheduler.offer(1, game), "Plans offered after submitting should be ignored")
+
+        scheduler = TurnScheduler(game.config, budget_fraction=1, safety_margin=0)
+        scheduler.soft_limit = 0.1
+        def slow_work(depth):
+            time.sleep(0.2)
+            return depth, game
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            scheduler.begin_turn()
+            scheduler.offer(0, game)
+            scheduler.add_work(slow_work)
+            scheduler.run()
+        self.assertTrue(scheduler.history[-1].watchdog, "The watchdog should submit when a step overruns")
+        self.assertEqual(2, len(output.getvalue().splitlines()), "The turn should only be submitted once")
+        self.assertGreater(scheduler.history[-1].elapsed, 0.15, "The overrun should be measured to the end of the slow step")
+        self.assertLess(scheduler.budget(), 0.05, "The budget should shrink by the overrun")
+
+        scheduler = TurnScheduler(game.config, budget_fraction=1, safety_margin=0)
+        scheduler.soft_limit = 0.2
+        steps = []
+        def timed_work(depth):
+            steps.append(depth)
+            time.sleep(0.3 if len(steps) == 1 else 0.01)
+            return depth, game
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for _ in range(2):
+                scheduler.begin_turn()
+                scheduler.add_work(timed_work)
+                scheduler.run()
+        self.assertLess(scheduler.history[-1].budget, scheduler.history[-2].budget - 0.05, "A slow step should shrink the budget of later turns")
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            scheduler.begin_turn()
+            first_watchdog = scheduler._watchdog
+            scheduler.begin_turn()
+            self.assertFalse(first_watchdog.is_alive(), "Starting a turn should stop the watchdog of the last one")
+            scheduler.submit()
+        self.assertEqual(2, len(output.getvalue().splitlines()), "Only the current turn should be submitted")
+
+    def test_simulation(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        result = ActionSimulator(game).simulate([("PI", 13, 0)] * 2)
+        self.assertEqual([2, 0], result.damage_dealt, "Undefended pings should reach the enemy edge")
+        self.assertEqual([[27, 14], [27, 14]], result.breaches[0], "Pings should score where their path ends")
+
+        game.game_map.add_unit("DF", [21, 12], 1)
+        game.attempt_spawn("PI", [13, 0])
+        simulator = ActionSimulator(game)
+        result = simulator.simulate()
+        self.assertEqual(([0, 0], [1, 0]), (result.damage_dealt, result.units_lost), "A destructor on the path should stop a single ping")
+        result = simulator.simulate([("EI", 13, 0)] * 4)
+        self.assertEqual([[], [[21, 12]]], result.firewalls_destroyed, "EMPs should outrange and destroy the destructor")
+        self.assertEqual(4, result.damage_dealt[0], "Every EMP should score once the destructor is gone")
+        self.assertEqual([75, 0], result.firewall_damage, "Firewall damage should be counted for the player whose units dealt it")
+        self.assertEqual(1, simulator.simulate([("PI", 13, 0)] * 4).damage_dealt[0], "One of four pings should get past the destructor")
+        result = simulator.simulate([("PI", 13, 0)] * 4, [("SI", 27, 14)])
+        self.assertEqual(([0, 1], [4, 0]), (result.damage_dealt, result.units_lost), "The scrambler should stop the ping that got through and score")
+
+        for x in range(9, 19):
+            game.game_map.add_unit("FF", [x, 4], 0)
+        result = ActionSimulator(game).simulate([("PI", 13, 0)])
+        self.assertEqual(([0, 0], [1, 0]), (result.damage_dealt, result.units_lost), "A ping without a path should self destruct")
+
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("FF", [13, 1], 0)
+        game.game_map.add_unit("FF", [14, 0], 0)
+        result = ActionSimulator(game).simulate([("PI", 13, 0), ("EI", 10, 3)], [("SI", 12, 1)], max_frames=2)
+        self.assertEqual([2, 0], result.units_lost, "Once the stuck ping is gone, the scrambler should destroy the EMP")
+
+        game = self.make_turn_0_map(adv)
+        for x in (3, 7, 11, 16, 20, 24):
+            game.game_map.add_unit("DF", [x, 15], 1)
+            game.game_map.add_unit("DF", [x, 12], 0)
+        for x in range(5, 23, 3):
+            game.game_map.add_unit("FF", [x, 16], 1)
+            game.game_map.add_unit("FF", [x, 11], 0)
+        game.game_map.add_unit("EF", [13, 18], 1)
+        game.game_map.add_unit("EF", [14, 9], 0)
+        simulator = ActionSimulator(game)
+        my_deploys = [("PI", 13, 0)] * 5 + [("EI", 14, 0)] * 2
+        enemy_deploys = [("PI", 14, 27)] * 5 + [("SI", 13, 27)] * 2
+        result = simulator.simulate(my_deploys, enemy_deploys)
+        self.assertEqual([[], [[3, 15], [5, 16]]], result.firewalls_destroyed, "The EMPs should break through the left of the enemy defence")
+        mixed = simulator.simulate([("PI", 13, 0), ("EI", 14, 0)] * 2 + [("PI", 13, 0)] * 3, enemy_deploys)
+        self.assertEqual(result.__dict__, mixed.__dict__, "The order units are deployed in should not matter")
+        rounds = 10
+        best = min(timeit.repeat(lambda: simulator.simulate(my_deploys, enemy_deploys), number=rounds, repeat=5)) / rounds
+        self.assertLess(best, 0.005, "A round should take around a millisecond")
+
+    def test_targeting(self, adv=False):
+        game = AdvancedGameState(self.make_turn_0_map(adv).config, self.make_turn_0_map(adv).serialized_string)
+        for unit_type, location, player_index in (("DF", [13, 12], 0), ("FF", [14, 15], 1), ("EF", [12, 15], 1),
+                                                  ("PI", [13, 14], 1), ("PI", [15, 13], 1), ("SI", [13, 13], 0), ("EI", [11, 13], 0)):
+            game.game_map.add_unit(unit_type, location, player_index)
+        game.game_map[[15, 13]][0].stability = 3
+        units = [unit for location in game.game_map for unit in game.game_map[location]]
+        expected = [game.get_target(unit) for unit in units]
+        self.assertEqual([13, 14], [expected[0].x, expected[0].y], "Information units should be targeted first, nearest first")
+        default = targeting.VECTORIZE_MIN_PAIRS
+        try:
+            for pairs in (default, 0, 10 ** 9):
+                targeting.VECTORIZE_MIN_PAIRS = pairs
+                self.assertEqual(expected, game.get_targets(units), "Batch targeting should agree with get_target")
+        finally:
+            targeting.VECTORIZE_MIN_PAIRS = default
+        attackers = [(13, 13, 0, 3, True), (13, 13, 0, 3, False), (13, 13, 0, None, False)]
+        targets = [(13, 16, 1, True, 10), (13, 8, 1, False, 10), (14, 14, 1, True, 10)]
+        self.assertEqual([-1, 2, 1], targeting.resolve_targets(attackers, targets), "Scramblers should ignore firewalls and ranges should be respected")
+
+        # With a range of 2.5, [16, 13] is within range + 0.51 of [13, 13] but outside the get_locations_in_range window
+        attackers = [(13, 13, 0, 2.5, False)]
+        targets = [(16, 13, 1, False, 10), (10, 13, 1, False, 20)]
+        self.assertEqual([1], targeting.resolve_targets(attackers, targets), "Ranges should follow get_locations_in_range")
+        config = json.loads(json.dumps(game.config))
+        config["unitInformation"][2]["range"] = 2.5
+        game = AdvancedGameState(config, game.serialized_string)
+        game.game_map.add_unit("DF", [13, 13], 0)
+        game.game_map.add_unit("PI", [16, 13], 1)
+        game.game_map.add_unit("PI", [10, 13], 1)
+        game.game_map[[16, 13]][0].stability = 1
+        destructor = game.game_map[[13, 13]][0]
+        self.assertEqual([10, 13], [game.get_target(destructor).x, game.get_target(destructor).y], "[16, 13] should be out of range")
+        try:
+            for pairs in (0, 10 ** 9):
+                targeting.VECTORIZE_MIN_PAIRS = pairs
+                self.assertEqual([game.get_target(destructor)], game.get_targets([destructor]), "Fractional ranges should agree with get_target")
+        finally:
+            targeting.VECTORIZE_MIN_PAIRS = default
+
+    def test_threat_map(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 13], 1)
+        game.game_map.add_unit("DF", [14, 13], 1)
+        game.game_map.add_unit("EF", [12, 13], 1)
+        self.assertEqual(8, game.game_map.threat_at([13, 11], 0), "Both destructors should reach [13, 11]")
+        self.assertEqual(4, game.game_map.threat_at([11, 11], 0), "Only one destructor should reach [11, 11]")
+        self.assertEqual(0, game.game_map.threat_at([13, 11], 1), "Destructors should not threaten their own units")
+        self.assertEqual(8, game.game_map.threat_map(0)[13][11], "The threat map should be indexed [x][y]")
+
+        fork = game.fork()
+        fork.game_map.remove_unit([14, 13])
+        self.assertEqual(4, fork.game_map.threat_at([13, 11], 0), "Removing a destructor should remove its threat")
+        self.assertEqual(8, game.game_map.threat_at([13, 11], 0), "Forks should not change the threat of the original map")
+
+        path = [[13, 9], [13, 10], [13, 11]]
+        self.assertEqual((0 + 8 + 8) * 2, game.game_map.path_damage(path, 0, 0.5), "A ping should take the threat of every tile for two frames")
+        self.assertEqual((0 + 4 + 4) * 4, fork.game_map.path_damage(path, 0, 0.25), "An EMP should take the threat of every tile for four frames")
+
+    def test_shield_coverage(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("EF", [13, 5], 0)
+        game.game_map.add_unit("EF", [13, 9], 0)
+        game.game_map.add_unit("EF", [14, 9], 1)
+        self.assertEqual(20, game.game_map.shield_at([13, 7], 0), "Both encryptors should cover [13, 7]")
+        self.assertEqual(10, game.game_map.shield_map(1)[13][7], "Encryptors should only shield their own player")
+        self.assertEqual(0, game.game_map.threat_at([13, 7], 1), "Encryptors should not threaten enemy units")
+
+        path = [[13, 1], [13, 2], [13, 3], [13, 4]]
+        shields = game.game_map.path_shielding(path, 0, 0.5)
+        self.assertEqual(0, shields[0], "[13, 1] is out of range of every encryptor")
+        self.assertEqual(10, shields[1], "The first encryptor should shield the unit when it comes into range")
+        self.assertAlmostEqual(10 - 0.15 * 4, shields[3], msg="The shield should decay every frame and not be given twice")
+        path = [[13, 4], [13, 5], [13, 6]]
+        self.assertAlmostEqual(20 - 0.15 * 4 * 2, game.game_map.path_shielding(path, 0, 0.25)[2], msg="The second encryptor should add to the shield")
+
+        fork = game.fork()
+        fork.game_map.remove_unit([13, 9])
+        self.assertEqual(10, fork.game_map.shield_at([13, 7], 0), "Removing an encryptor should remove its shield")
+
+    def test_rollouts(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [21, 12], 1)
+        game.attempt_spawn("EF", [13, 5])
+        candidates = deploy_candidates(game, [game.PING], (1, 5, 6))
+        self.assertEqual(28 * 2, len(candidates), "Every free friendly edge location should be tried for every affordable count")
+        with RolloutPool(game.config, processes=2, rollouts=2, seed=1) as pool:
+            results = pool.evaluate(game, candidates[:4])
+            self.assertEqual(candidates[:4], [stats.candidate for stats in results], "Results should be in the order of the candidates")
+            self.assertTrue(all(stats.rollouts == 2 for stats in results), "Every candidate should be played out the default number of times")
+
+            rollouts._init_worker(game.config)
+            block = game.to_shared_memory()
+            task = (block.name, candidates[0], 2, random.Random(1).getrandbits(32))
+            self.assertEqual(results[0], rollouts._run_rollouts(task), "Workers should read the board from shared memory")
+            block.close()
+            block.unlink()
+            self.assertEqual(results[0], rollouts._run_rollouts(task), "Workers should keep the board of the block they read")
+
+            with self.assertRaises(multiprocessing.TimeoutError):
+                pool.evaluate(game, candidates, rollouts=500, timeout=0.05)
+            start = time.monotonic()
+            results = pool.evaluate(game, candidates[:2], timeout=5)
+            self.assertEqual(2, len(results), "Evaluating should work again after a timeout")
+            self.assertLess(time.monotonic() - start, 2, "Work left over from a timed out call should not hold up the next one")
+
+    def test_snapshot(self, adv=False):
+        game = self.make_turn_0_map(adv)
+        game.attempt_spawn("DF", [13, 12])
+        game.attempt_spawn("PI", [13, 0], 2)
+        game.game_map.add_unit("SI", [13, 0], 1)
+        game.game_map.add_unit("EF", [12, 14], 1)
+        game.game_map[[12, 14]][0].stability = 12.5
+        game.game_map[[12, 14]][0].pending_removal = True
+        data = game.to_bytes()
+
+        def units(state):
+            return [(unit.unit_type, unit.player_index, unit.stability, unit.pending_removal, unit.x, unit.y)
+                    for location in state.game_map for unit in state.game_map[location]]
+        for buffer in (data, bytearray(data), memoryview(data)):
+            copy = type(game).from_buffer(game.config, buffer)
+            self.assertEqual(units(game), units(copy), "Snapshots should keep every unit in order")
+            self.assertEqual((game._build_stack, game._deploy_stack), (copy._build_stack, copy._deploy_stack), "Snapshots should keep queued spawns")
+            self.assertEqual((game.turn_number, game._player_resources), (copy.turn_number, copy._player_resources), "Snapshots should keep the turn and resources")
+            self.assertEqual(game.game_map.board_hash, copy.game_map.board_hash, "Snapshots should restore the same board")
+            self.assertEqual(data, copy.to_bytes(), "Snapshots should round trip exactly")
+        self.assertIsInstance(copy, type(game), "from_buffer should build the class it is called on")
+
+        block = game.to_shared_memory()
+        try:
+            self.assertEqual(units(game), units(GameState.from_buffer(game.config, block.buf)), "Snapshots should load from shared memory")
+        finally:
+            block.close()
+            block.unlink()
+        with self.assertRaises(ValueError):
+            GameState.from_buffer(game.config, b"\0" * len(data))
+        for count in range(10):
+            offsets = snapshot.read_header(snapshot.HEADER.pack(snapshot.MAGIC, snapshot.VERSION, 0, *[0] * 8, count, 0))[11:]
+            self.assertEqual([0, 0, 0], [offset % 8 for offset in offsets], "Every column should be 8 byte aligned")
+
+    def test_batch(self, adv=False):
+        if np is None:
+            return
+        game = self.make_turn_0_map(adv)
+        game.game_map.add_unit("DF", [13, 12], 0)
+        game.game_map.add_unit("EF", [12, 11], 0)
+        walled = game.fork()
+        for x in range(28):
+            if walled.game_map.in_arena_bounds([x, 13]):
+                walled.game_map.add_unit("FF", [x, 13], 1)
+        walled.game_map.add_unit("PI", [13, 0], 0)
+        games = [game, walled]
+        batch = BoardBatch.from_game_states(games)
+        self.assertEqual(2, len(batch), "There should be one board per game state")
+        self.assertEqual(-1, batch.unit_type[1, 13, 0], "Information units should be left out")
+
+        for board, state in enumerate(games):
+            for player_index in (0, 1):
+                threat = batch.threat(player_index)[board]
+                shield = batch.shield(player_index)[board]
+                for x in range(28):
+                    for y in range(28):
+                        self.assertEqual(state.game_map.threat_at([x, y], player_index), threat[x, y], "Threat should match the game map at {}".format([x, y]))
+                        self.assertEqual(state.game_map.shield_at([x, y], player_index), shield[x, y], "Shield should match the game map at {}".format([x, y]))
+
+        features = batch.features()
+        self.assertEqual((2, len(batch.feature_names)), features.shape, "There should be one row per board and one column per feature")
+        column = dict(zip(batch.feature_names, features.T))
+        self.assertEqual([1, 1], list(column["count_DF_0"]), "Both boards have one friendly destructor")
+        self.assertEqual([0, 28], list(column["count_FF_1"]), "The wall should be counted")
+        self.assertEqual(len(game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT)) - 1, column["path_length_2"][0],
+                         "The shortest path from the bottom left edge should match find_path_to_edge")
+        self.assertEqual(float("inf"), column["path_length_2"][1], "A wall should block every path across the arena")
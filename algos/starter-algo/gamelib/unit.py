@@ -1,8 +1,8 @@
-def is_stationary(unit_type, firewall_types):
-    return unit_type in firewall_types
+from .game_config import compile_config
+
 
 class GameUnit:
-    """Holds information about a Unit. 
+    """Holds information about a Unit.
 
     Attributes:
         * unit_type (string): This unit's type
@@ -20,37 +20,60 @@ class GameUnit:
         * stability (float): The current health of this unit
         * cost (int): The resource cost of this unit
 
+    Only the location, owner, stability and pending_removal are stored on each unit. The other
+    attributes are read only and come from the UnitStats shared by every unit of the same type,
+    see GameConfig.unit_stats.
+
     """
+    __slots__ = ("unit_type", "player_index", "stability", "x", "y", "pending_removal", "stats")
+
     def __init__(self, unit_type, config, player_index=None, stability=None, x=-1, y=-1):
         """ Initialize unit variables using args passed
 
         """
         self.unit_type = unit_type
-        self.config = config
         self.player_index = player_index
         self.pending_removal = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.stability = self.max_stability if not stability else stability
-
-    def __serialize_type(self):
-        from .game_state import FIREWALL_TYPES, UNIT_TYPE_TO_INDEX, ENCRYPTOR
-        self.stationary = is_stationary(self.unit_type, FIREWALL_TYPES)
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        if self.stationary:
-            self.speed = 0
-            if self.unit_type == ENCRYPTOR:
-                self.damage = type_config["shieldAmount"]
-            else:
-                self.damage = type_config["damage"]
-        else:
-            self.speed = type_config["speed"]
-            self.damage_f = type_config["damageF"]
-            self.damage_i = type_config["damageI"]
-        self.range = type_config["range"]
-        self.max_stability = type_config["stability"]
-        self.cost = type_config["cost"]
+        self.stats = compile_config(config).unit_stats[unit_type]
+        self.stability = self.stats.max_stability if not stability else stability
+
+    @property
+    def config(self):
+        return self.stats.config
+
+    @property
+    def stationary(self):
+        return self.stats.stationary
+
+    @property
+    def speed(self):
+        return self.stats.speed
+
+    @property
+    def damage(self):
+        return self.stats.damage
+
+    @property
+    def damage_f(self):
+        return self.stats.damage_f
+
+    @property
+    def damage_i(self):
+        return self.stats.damage_i
+
+    @property
+    def range(self):
+        return self.stats.range
+
+    @property
+    def max_stability(self):
+        return self.stats.max_stability
+
+    @property
+    def cost(self):
+        return self.stats.cost
 
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
@@ -62,4 +85,3 @@ class GameUnit:
 
     def __repr__(self):
         return self.__toString()
-
@@ -1,4 +1,13 @@
 import sys
+import json
+
+try:
+    import orjson as _fast_json
+except ImportError:
+    try:
+        import ujson as _fast_json
+    except ImportError:
+        _fast_json = None
 
 
 BANNER_TEXT = "---------------- Starting Your Algo --------------------"
@@ -21,6 +30,20 @@ def get_command():
         exit()
     return ret
 
+def json_loads(text):
+    """Decodes a json string, using orjson or ujson when one of them is installed
+
+    Args:
+        * text: The json string to decode
+
+    Returns:
+        The decoded object
+
+    """
+    if _fast_json is not None:
+        return _fast_json.loads(text)
+    return json.loads(text)
+
 def send_command(cmd):
     """Sends your turn to standard output.
     Should usually only be called by 'GameState.submit_turn()'